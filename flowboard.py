@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 import pickle
+from collections import OrderedDict
+from time import time
 
 from graph import GraphOntoRectangularGrid
-from flowsolver import FlowPuzzle, FlowSolver
+from flowsolver import FlowPuzzle, FlowSolver, cached
 
 
 class FlowBoard(object):
@@ -51,6 +53,17 @@ class FlowBoard(object):
     def blockages(self):
         return iter(self._blockages)
 
+    def contentKey(self):
+        """Return a hashable value, equal for boards with equal content."""
+        return self._layoutKey() + (
+            tuple(sorted((k, tuple(sorted(l)))
+                         for k, l in self._endpoints.items())),)
+
+    def _layoutKey(self):
+        return (self._size,
+                tuple(sorted(self._bridges)),
+                tuple(sorted(self._blockages)))
+
     def isEmpty(self):
         return not (self._endpoints or self._bridges or self._blockages)
 
@@ -132,13 +145,25 @@ class FlowBoard(object):
         """
             Return (FlowPuzzle, dict)
             The dictionary is a mapping of vertex to cell coordinates.
+            Both are cached by board content and shared between boards,
+            so they must not be changed.
         """
-        gridgraph = GraphOntoRectangularGrid(self.size)
+        return cached(_puzzleCache, self.contentKey(), self._compilePuzzle)
 
+    def _compilePuzzle(self):
+        graph, locations, vertexAt, exclusiveSets = cached(
+            _layoutCache, self._layoutKey(), self._compileLayout)
         endpointPairs = []
         for _, xypair in self.endpointPairs:
-            vpair = tuple(map(gridgraph.singleVertexAt, xypair))
-            endpointPairs.append(vpair)
+            endpointPairs.append(tuple(map(vertexAt.get, xypair)))
+        return FlowPuzzle(graph, endpointPairs, exclusiveSets), locations
+
+    def _compileLayout(self):
+        """
+            Return (graph, vertex : cell, cell : vertex, exclusive sets),
+            which depend only on the size, bridges and blockages.
+        """
+        gridgraph = GraphOntoRectangularGrid(self.size)
 
         for xy in self.blockages:
             gridgraph.removeVertexAt(xy)
@@ -159,8 +184,10 @@ class FlowBoard(object):
 
             exclusiveSets.append({xpass, ypass})
 
-        return (FlowPuzzle(gridgraph.graph, endpointPairs, exclusiveSets),
-                gridgraph.getLocationMap())
+        locations = gridgraph.getLocationMap()
+        vertexAt = dict((xy, v) for v, xy in locations.items()
+                        if xy not in self._bridges)
+        return gridgraph.graph, locations, vertexAt, exclusiveSets
 
     def _includesCell(self, cell):
         return 0 <= cell[0] < self.size and 0 <= cell[1] < self.size
@@ -179,11 +206,17 @@ class FlowBoard(object):
             yield cell[0], cell[1] + 1
 
 
+# FlowBoard.contentKey() : FlowBoard.getPuzzle()
+_puzzleCache = OrderedDict()
+# FlowBoard._layoutKey() : FlowBoard._compileLayout()
+_layoutCache = OrderedDict()
+
+
 class FlowBoardSolver(FlowSolver):
-    def __init__(self, board):
+    def __init__(self, board, assumeUnique=False, ordering=None):
         assert board.isValid()
         puzzle, self._cellmap = board.getPuzzle()
-        super(FlowBoardSolver, self).__init__(puzzle)
+        super(FlowBoardSolver, self).__init__(puzzle, assumeUnique, ordering)
 
         self._vertexKey = {}
         for v1, v2 in puzzle.endpointPairs:
@@ -194,4 +227,85 @@ class FlowBoardSolver(FlowSolver):
 
     def getFlows(self):
         for vflow in super(FlowBoardSolver, self).getFlows():
-            yield self._vertexKey[vflow[0]], map(self._cellmap.get, vflow)
+            cells = [self._cellmap[v] for v in vflow]
+            yield self._vertexKey[vflow[0]], cells
+
+
+class FlowBoardSnapshot(object):
+    """
+        Flows and status of a FlowBoardSolver at one moment. Picklable,
+        so it can be sent from a solving process to the GUI.
+    """
+
+    def __init__(self, solver):
+        self._flows = [(k, list(cells)) for k, cells in solver.getFlows()]
+        self._hash = solver.stateHash()
+        self._done = solver.done
+        self._solved = solver.solved
+        self._progress = solver.progress
+        self._statesVisited = solver.statesVisited
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def solved(self):
+        return self._solved
+
+    @property
+    def progress(self):
+        return self._progress
+
+    @property
+    def statesVisited(self):
+        return self._statesVisited
+
+    def getFlows(self):
+        return iter(self._flows)
+
+    def stateHash(self):
+        return self._hash
+
+
+def solveBoard(board, conn, interval=0.05):
+    """
+        Solve board, sending a FlowBoardSnapshot through conn at most
+        every interval seconds and once done. Then, if solved, receiving
+        'next' continues to the next solution; anything else ends.
+        Meant as the target of a worker process.
+    """
+    solver = FlowBoardSolver(board)
+    while True:
+        sent = time()
+        while not solver.run(20):
+            if time() - sent >= interval:
+                conn.send(FlowBoardSnapshot(solver))
+                sent = time()
+        conn.send(FlowBoardSnapshot(solver))
+        if not solver.solved:
+            return
+        try:
+            if conn.recv() != 'next':
+                return
+        except EOFError:
+            return
+        solver.skipSolution()
+
+
+def checkSolvable(board, seconds=2.0):
+    """
+        Return True if board has a solution, False if it has none, or
+        None if the search didn't settle that within about seconds.
+    """
+    solver = FlowBoardSolver(board)
+    deadline = time() + seconds
+    while not solver.run(20):
+        if time() > deadline:
+            return None
+    return solver.solved
+
+
+def checkBoard(board, conn, seconds=2.0):
+    """Send checkSolvable(board, seconds) through conn, from a worker."""
+    conn.send(checkSolvable(board, seconds))
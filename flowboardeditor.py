@@ -1,17 +1,22 @@
 #!/usr/bin/env python
 
 from copy import deepcopy
-from PyQt5.QtCore import Qt, QSize, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import Qt, QSize, QObject, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QColor, QPen, QImage
 from PyQt5.QtWidgets import QWidget, QToolBar, QComboBox, QButtonGroup, \
     QPushButton, QCheckBox, QGridLayout, QBoxLayout, QSizePolicy
-from flowboard import FlowBoard
+from flowboard import FlowBoard, checkBoard
 from flowpainter import SpacedGrid, FlowBoardPainter
+from flowworker import FlowWorker
 
 
 class FlowBoardEditor(QWidget):
 
     boardChanged = pyqtSignal(FlowBoard)
+    # 'incomplete', 'checking', 'solvable', 'unsolvable' or 'unknown'
+    solvabilityChanged = pyqtSignal(str)
+
+    _checkResults = {True: 'solvable', False: 'unsolvable', None: 'unknown'}
 
     def __init__(self):
         super(FlowBoardEditor, self).__init__()
@@ -22,6 +27,21 @@ class FlowBoardEditor(QWidget):
         self._board = None
         self._grid = None
         self._lastMoveCell = None
+        # Solvability is checked in a worker process once edits pause.
+        # self._checkCache  FlowBoard.contentKey() : solvability, only
+        #                   'solvable' or 'unsolvable', so a timed out
+        #                   or failed check is tried again
+        # self._checkKey  key of the board being checked by the worker
+        self._solvability = 'incomplete'
+        self._checkCache = {}
+        self._checkKey = None
+        self._checkDelay = QTimer()
+        self._checkDelay.setSingleShot(True)
+        self._checkDelay.timeout.connect(self._startCheck)
+        self._checkWorker = FlowWorker(50)
+        self._checkWorker.received.connect(self._checkReceived)
+        self._checkWorker.lost.connect(self._checkLost)
+        self.boardChanged.connect(self._scheduleCheck)
         self.newBoard(self._toolbar.selectedSize)
 
     @property
@@ -36,6 +56,10 @@ class FlowBoardEditor(QWidget):
     def boardIsValid(self):
         return self._board.isValid()
 
+    @property
+    def solvability(self):
+        return self._solvability
+
     def newBoard(self, boardSize):
         self.setBoard(FlowBoard(boardSize))
         self.toolbar.tools.selectFirstOpenEndpoint(self._board)
@@ -59,6 +83,10 @@ class FlowBoardEditor(QWidget):
     def saveBoardFile(self, filepath):
         self._board.saveFile(filepath)
 
+    def closeEvent(self, event):
+        self._stopCheck()
+        super(FlowBoardEditor, self).closeEvent(event)
+
     def resizeEvent(self, event):
         super(FlowBoardEditor, self).resizeEvent(event)
         self._updateGrid()
@@ -163,6 +191,47 @@ class FlowBoardEditor(QWidget):
     def _toolChanged(self):
         self.repaint()
 
+    def _setSolvability(self, solvability):
+        if solvability != self._solvability:
+            self._solvability = solvability
+            self.solvabilityChanged.emit(solvability)
+
+    @pyqtSlot(FlowBoard)
+    def _scheduleCheck(self, board):
+        # whatever the worker is checking is stale now
+        self._stopCheck()
+        key = board.contentKey()
+        if key in self._checkCache:
+            self._setSolvability(self._checkCache[key])
+        elif not board.isValid():
+            self._setSolvability('incomplete')
+        else:
+            self._setSolvability('checking')
+            self._checkDelay.start(400)
+
+    @pyqtSlot()
+    def _startCheck(self):
+        self._checkKey = self._board.contentKey()
+        self._checkWorker.start(checkBoard, self.getBoard())
+
+    @pyqtSlot(object)
+    def _checkReceived(self, result):
+        self._finishCheck(self._checkResults[result])
+
+    @pyqtSlot()
+    def _checkLost(self):
+        self._finishCheck('unknown')
+
+    def _finishCheck(self, solvability):
+        if solvability != 'unknown':
+            self._checkCache[self._checkKey] = solvability
+        self._stopCheck()
+        self._setSolvability(solvability)
+
+    def _stopCheck(self):
+        self._checkDelay.stop()
+        self._checkWorker.stop()
+
 
 ############################ cell tools
 
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+    Generate random boards which have exactly one solution.
+
+    flowgenerator.py -s size -p pairs [-d density] [-b bridges] [-n count]
+                     [-j jobs] [--seed seed] [-t seconds] -o outdir
+        density is the fraction of cells blocked, count the number of
+        boards to write to outdir, seconds the solving time allowed to
+        prove a board's solution unique; stops short, failing, if the
+        settings stop giving boards
+"""
+
+import os
+from multiprocessing import get_context
+from random import Random
+from time import time
+from flowboard import FlowBoard
+from flowsolver import FlowSolver
+
+# one color each in flowpainter.FlowPalette
+MAX_PAIRS = 16
+
+
+def randomCover(puzzle, pairs, rng, shuffles=None):
+    """
+        Return a list of pairs paths covering every vertex of puzzle's
+        graph, none passing next to itself and each at least 3 vertices
+        long, or None if none was found.
+        Starting from single-vertex paths, a random path end repeatedly
+        grows onto a neighbor: joining the path there if it ends there,
+        or taking it over from there on if not. Joins stop once there
+        are few enough paths, and the rest carries on for a while to
+        mix up the shapes.
+        A path which passes next to itself can usually be rerouted, so
+        such paths would rarely leave the puzzle a unique solution.
+    """
+    graph = puzzle.graph
+    paths = dict((v, [v]) for v in graph.vertices)  # id : path
+    owner = dict((v, v) for v in graph.vertices)  # vertex : path id
+
+    def extensible(p, q):
+        # Can q be appended to p? Bridge passes are exclusive, so
+        # a path can't use both passes of one bridge.
+        pset = set(p)
+        for v in q:
+            if pset.intersection(puzzle.exclusions(v) or ()):
+                return False
+        qset = set(q)
+        for v in p[:-1]:
+            if graph.adjacencies(v) & qset:
+                return False
+        return not (graph.adjacencies(p[-1]) & qset) - {q[0]}
+
+    moves = 0
+    shuffles = shuffles or 20 * len(owner)
+    limit = 200 * len(owner)
+    while moves < limit and (len(paths) > pairs or shuffles > 0):
+        moves += 1
+        if len(paths) <= pairs:
+            shuffles -= 1
+        i = rng.choice(list(paths))
+        p = paths[i]
+        if rng.random() < 0.5:
+            p.reverse()
+        ends = graph.adjacencies(p[-1])
+        if not ends:
+            continue
+        u = rng.choice(list(ends))
+        j = owner[u]
+        if j == i:
+            continue
+        q = paths[j]
+        if q[-1] == u:
+            q.reverse()
+        if q[0] == u:
+            if len(paths) <= pairs or not extensible(p, q):
+                continue
+            p.extend(q)
+            for v in q:
+                owner[v] = i
+            del paths[j]
+        else:
+            k = q.index(u)
+            if len(paths) <= pairs and k < 3:
+                continue
+            tail = q[k:]
+            if not extensible(p, tail):
+                continue
+            p.extend(tail)
+            del q[k:]
+            for v in tail:
+                owner[v] = i
+    covers = list(paths.values())
+    if len(covers) > pairs or any(len(p) < 3 for p in covers):
+        return None
+    return covers
+
+
+def hasUniqueSolution(puzzle, seconds=1.0):
+    """
+        Return True if puzzle has exactly one solution, False if it has
+        none or several, or None if that wasn't settled within seconds.
+    """
+    solver = FlowSolver(puzzle)
+    found = sum(1 for _ in solver.solutions(2, seconds=seconds))
+    if found < 2 and not solver.done:
+        return None
+    return found == 1
+
+
+def generateBoard(size, pairs, density=0.0, bridges=0, seed=None,
+                  seconds=1.0, attempts=20):
+    """
+        Return a FlowBoard of size with pairs endpoint pairs, about
+        density of its cells blocked and up to bridges bridges, which
+        has exactly one solution, or None if attempts covers all fail.
+    """
+    assert 0 < pairs <= MAX_PAIRS
+    rng = Random(seed)
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    for _ in range(attempts):
+        board = FlowBoard(size)
+        for cell in rng.sample(cells, int(round(density * len(cells)))):
+            board.setBlockage(cell)
+        placed = 0
+        for cell in rng.sample(cells, len(cells)):
+            if placed == bridges:
+                break
+            if board.isClear(cell) and board.bridgeValidAt(cell):
+                board.setBridge(cell)
+                placed += 1
+        puzzle, cellmap = board.getPuzzle()
+        # blockages can cut a cell off, and no path can cover it then
+        if not all(puzzle.graph.adjacencies(v)
+                   for v in puzzle.graph.vertices):
+            continue
+        cover = randomCover(puzzle, pairs, rng)
+        if cover is None:
+            continue
+        if any(puzzle.exclusions(p[0]) or puzzle.exclusions(p[-1])
+               for p in cover):
+            continue
+        for key, path in enumerate(cover, 1):
+            board.setEndpoint(cellmap[path[0]], key)
+            board.setEndpoint(cellmap[path[-1]], key)
+        if not board.isValid():
+            continue
+        if hasUniqueSolution(board.getPuzzle()[0], seconds):
+            return board
+    return None
+
+
+def _generateTask(args):
+    return generateBoard(*args)
+
+
+def generateBoards(count, size, pairs, density=0.0, bridges=0, seed=0,
+                   seconds=1.0, jobs=None, idle=10):
+    """
+        Yield count unique boards, generated by jobs worker processes,
+        or fewer if idle batches of seeds in a row give none, as when
+        there are too many pairs for the size.
+    """
+    context = get_context('spawn')
+    with context.Pool(jobs) as pool:
+        batch = 4 * (jobs or os.cpu_count())
+        fruitless = 0
+        while count > 0 and fruitless < idle:
+            tasks = [(size, pairs, density, bridges, s, seconds)
+                     for s in range(seed, seed + batch)]
+            seed += batch
+            fruitless += 1
+            for board in pool.imap_unordered(_generateTask, tasks):
+                if board is not None and count > 0:
+                    fruitless = 0
+                    count -= 1
+                    yield board
+
+
+def _main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Generate boards with exactly one solution.")
+    parser.add_argument('-s', '--size', type=int, required=True)
+    parser.add_argument('-p', '--pairs', type=int, required=True)
+    parser.add_argument('-d', '--density', type=float, default=0.0)
+    parser.add_argument('-b', '--bridges', type=int, default=0)
+    parser.add_argument('-n', '--count', type=int, default=100)
+    parser.add_argument('-j', '--jobs', type=int, default=None)
+    parser.add_argument('-t', '--seconds', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--outdir', required=True)
+    args = parser.parse_args(argv[1:])
+    if not 0 < args.pairs <= MAX_PAIRS:
+        parser.error("pairs must be 1 to {0}".format(MAX_PAIRS))
+    os.makedirs(args.outdir, exist_ok=True)
+    started = time()
+    boards = generateBoards(args.count, args.size, args.pairs, args.density,
+                            args.bridges, args.seed, args.seconds, args.jobs)
+    written = 0
+    for i, board in enumerate(boards):
+        board.saveFile(os.path.join(args.outdir, 'g{0:02}_{1}_{2:05}.flow'
+                                    .format(args.size, args.pairs, i)))
+        written += 1
+    elapsed = time() - started
+    print("{0} boards in {1:.1f} seconds".format(written, elapsed))
+    if written < args.count:
+        print("gave up, no more boards found for these settings")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(_main(sys.argv))
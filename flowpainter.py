@@ -176,18 +176,38 @@ class FlowBoardPainter(QPainter):
         return range(1, len(FlowPalette))
 
     @staticmethod
-    def renderImage(board, solver=None):
-        cellsize = 33
-        spacing = 1
-        imgsize = board.size * (cellsize + spacing) + spacing
+    def gridLayer(boardsize, imgsize, spacing=1):
+        """
+            Return (QImage, SpacedGrid) for square images imgsize pixels
+            wide. The image holds only the grid lines, on transparency,
+            so it can be reused for every board of boardsize.
+        """
         imgsize = QSize(imgsize, imgsize)
         img = QImage(imgsize, QImage.Format_ARGB32_Premultiplied)
-        grid = SpacedGrid(board.size, board.size, imgsize, spacing)
+        img.fill(Qt.transparent)
+        grid = SpacedGrid(boardsize, boardsize, imgsize, spacing)
+        ptr = FlowBoardPainter(img)
+        ptr.drawGrid(grid)
+        ptr.end()
+        return img, grid
+
+    @staticmethod
+    def renderImage(board, solver=None, imgsize=None, layer=None):
+        """
+            imgsize: width in pixels, by default 34 per cell
+            layer: gridLayer() for this board size and imgsize
+        """
+        if layer is None:
+            if imgsize is None:
+                imgsize = board.size * 34 + 1
+            layer = FlowBoardPainter.gridLayer(board.size, imgsize)
+        gridimg, grid = layer
+        img = QImage(gridimg.size(), QImage.Format_ARGB32_Premultiplied)
         ptr = FlowBoardPainter(img)
         ptr.fillBackground()
         if solver and solver.solved:
             ptr.drawFlowHighlights(grid, solver)
-        ptr.drawGrid(grid)
+        ptr.drawImage(0, 0, gridimg)
         ptr.drawBoardFeatures(grid, board)
         if solver:
             ptr.drawFlows(grid, solver)
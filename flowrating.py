@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+    Rate boards by difficulty from statistics of one solve each.
+
+    flowrating.py [-j jobs] [-t seconds] [-w weights.json] boards...
+        print boards from hardest to easiest with their scores
+    flowrating.py [-j jobs] [-t seconds] -c targets.json -w weights.json
+        boards...
+        fit weights so scores match targets.json, a mapping of board
+        file to a known difficulty, and write them to weights.json
+"""
+
+import json
+from math import log10
+from multiprocessing import get_context
+from time import time
+from flowboard import FlowBoard, FlowBoardSolver
+
+FEATURES = ('logVisited', 'logBacktracks', 'branchingFactor',
+            'forcedRatio', 'memoHitRate', 'depthRatio')
+
+# uncalibrated: mostly log10 of frames visited, more where moves are guesses
+DEFAULT_WEIGHTS = {
+    'bias': 0.0,
+    'logVisited': 1.0,
+    'logBacktracks': 0.5,
+    'branchingFactor': 1.0,
+    'forcedRatio': -1.0,
+    'memoHitRate': 0.0,
+    'depthRatio': 0.0}
+
+
+def boardFeatures(boardfile, seconds=60.0):
+    """
+        Solve the board once, for at most about seconds, and return its
+        features for scoring along with the solver's statistics, or None
+        if the board can't be read. 'complete' is False if time ran out.
+    """
+    board = FlowBoard.parseFile(boardfile)
+    if board is None or not board.isValid():
+        return None
+    solver = FlowBoardSolver(board)
+    deadline = time() + seconds
+    while not solver.run(50):
+        if time() > deadline:
+            break
+    stats = solver.statistics()
+    branching = stats['branching']
+    choices = dict((n, k) for n, k in branching.items() if n > 1)
+    cells = board.size ** 2 - len(list(board.blockages))
+    features = {
+        'logVisited': log10(stats['visited']),
+        'logBacktracks': log10(1 + stats['backtracks']),
+        'branchingFactor': (sum(n * k for n, k in choices.items()) /
+                            float(sum(choices.values())) if choices else 1.0),
+        'forcedRatio': stats['forcedRatio'],
+        'memoHitRate': stats['memoHitRate'],
+        'depthRatio': stats['maxDepth'] / float(cells)}
+    features.update(stats)
+    features['complete'] = solver.done
+    features['solved'] = solver.solved
+    return features
+
+
+def score(features, weights=None):
+    weights = weights or DEFAULT_WEIGHTS
+    return weights.get('bias', 0.0) + sum(
+        weights.get(f, 0.0) * features[f] for f in FEATURES)
+
+
+def calibrate(featurelist, targets, ridge=1e-3):
+    """
+        Return weights whose scores best fit targets in the least squares
+        sense, with a little ridge regularization to keep them stable.
+    """
+    rows = [[1.0] + [features[f] for f in FEATURES]
+            for features in featurelist]
+    n = len(FEATURES) + 1
+    a = [[sum(r[i] * r[j] for r in rows) + (ridge if i == j else 0.0)
+          for j in range(n)] for i in range(n)]
+    b = [sum(r[i] * t for r, t in zip(rows, targets)) for i in range(n)]
+    w = _solveLinear(a, b)
+    weights = {'bias': w[0]}
+    weights.update(zip(FEATURES, w[1:]))
+    return weights
+
+
+def _solveLinear(a, b):
+    """Solve a x = b by Gaussian elimination with partial pivoting."""
+    n = len(b)
+    m = [list(row) + [bi] for row, bi in zip(a, b)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            f = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= f * m[col][c]
+    x = [0.0] * n
+    for r in reversed(range(n)):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / \
+            m[r][r]
+    return x
+
+
+def _featuresTask(args):
+    return boardFeatures(*args)
+
+
+def rateBoards(boardfiles, seconds=60.0, jobs=None):
+    """Yield (boardfile, features) for each board, solving in parallel."""
+    tasks = [(f, seconds) for f in boardfiles]
+    context = get_context('spawn')
+    with context.Pool(jobs) as pool:
+        for task, features in zip(tasks, pool.imap(_featuresTask, tasks)):
+            yield task[0], features
+
+
+def _main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Rate boards by difficulty.")
+    parser.add_argument('boards', nargs='+')
+    parser.add_argument('-j', '--jobs', type=int, default=None)
+    parser.add_argument('-t', '--seconds', type=float, default=60.0,
+                        help="solving time allowed per board")
+    parser.add_argument('-w', '--weights',
+                        help="weights file to read, or write with -c")
+    parser.add_argument('-c', '--calibrate', metavar='TARGETS',
+                        help="fit weights to known difficulties")
+    args = parser.parse_args(argv[1:])
+    rated = [(f, features) for f, features in
+             rateBoards(args.boards, args.seconds, args.jobs)
+             if features is not None]
+
+    if args.calibrate:
+        if not args.weights:
+            parser.error("-c needs -w to write the weights to")
+        with open(args.calibrate) as f:
+            targets = json.load(f)
+        fitted = [(features, targets[f]) for f, features in rated
+                  if f in targets]
+        if len(fitted) <= len(FEATURES):
+            parser.error("too few rated boards to calibrate")
+        weights = calibrate(*zip(*fitted))
+        with open(args.weights, 'w') as f:
+            json.dump(weights, f, indent=1, sort_keys=True)
+    elif args.weights:
+        with open(args.weights) as f:
+            weights = json.load(f)
+    else:
+        weights = DEFAULT_WEIGHTS
+
+    rated.sort(key=lambda fr: score(fr[1], weights), reverse=True)
+    for f, features in rated:
+        print("{0:6.2f} {1:9} {2:9} {3:7.2%}{4} {5}".format(
+            score(features, weights), features['visited'],
+            features['backtracks'], features['forcedRatio'],
+            '' if features['complete'] else ' (timed out)', f))
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+    Render solved boards to PNG thumbnails without a display, from
+    results files written by flowsolve.py -r, without solving again.
+
+    flowrender.py [-s size] [-j jobs] -o outdir results...
+        write outdir/<board name>.png for each result
+    flowrender.py [-s size] [-j jobs] [-c columns] --sheet file.png results...
+        write all thumbnails to one sprite sheet, and next to it
+        file.json giving the position of each board in the sheet, keyed
+        by the name -o would give its file, less the extension
+"""
+
+import os
+from math import ceil, sqrt
+from multiprocessing import get_context
+
+# Qt must not look for a display in this process or its workers
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+_app = None
+_layers = {}  # (board size, image size) : FlowBoardPainter.gridLayer()
+
+
+def _initWorker():
+    global _app
+    from PyQt5.QtGui import QGuiApplication
+    if QGuiApplication.instance() is None:
+        _app = QGuiApplication([])
+
+
+def _renderResult(task):
+    """
+        Render one result. Write it to outpath if given and return True,
+        else return the PNG data. Either way None if the board is gone.
+    """
+    result, imgsize, outpath = task
+    from PyQt5.QtCore import QBuffer, QIODevice
+    from flowboard import FlowBoard
+    from flowpainter import FlowBoardPainter
+    board = FlowBoard.parseFile(result.boardFile)
+    if board is None:
+        return None
+    key = (board.size, imgsize)
+    if key not in _layers:
+        _layers[key] = FlowBoardPainter.gridLayer(board.size, imgsize)
+    img = FlowBoardPainter.renderImage(board, result, layer=_layers[key])
+    if outpath is not None:
+        if not img.save(outpath, 'PNG'):
+            raise IOError("could not write " + outpath)
+        return True
+    buf = QBuffer()
+    buf.open(QIODevice.WriteOnly)
+    img.save(buf, 'PNG')
+    return bytes(buf.data())
+
+
+def _boardName(result):
+    return os.path.splitext(os.path.basename(result.boardFile))[0]
+
+
+def _outputNames(results):
+    """Return a name per result, numbered where boards share one."""
+    names = []
+    used = set()
+    for result in results:
+        name = unique = _boardName(result)
+        n = 1
+        while unique in used:
+            n += 1
+            unique = '{0}_{1}'.format(name, n)
+        used.add(unique)
+        names.append(unique)
+    return names
+
+
+def renderFiles(results, outdir, imgsize=128, jobs=None):
+    """Write a PNG per result to outdir, return the number written."""
+    os.makedirs(outdir, exist_ok=True)
+    results = list(results)
+    tasks = [(r, imgsize, os.path.join(outdir, name + '.png'))
+             for r, name in zip(results, _outputNames(results))]
+    context = get_context('spawn')
+    with context.Pool(jobs, initializer=_initWorker) as pool:
+        return sum(1 for written in pool.imap_unordered(
+            _renderResult, tasks, chunksize=16) if written)
+
+
+def renderSheet(results, sheetpath, imgsize=128, jobs=None, columns=None):
+    """
+        Write the results as one sprite sheet, columns wide, and an index
+        of where each board is in it. Return the number of boards drawn.
+    """
+    import json
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage, QPainter
+    results = list(results)
+    columns = columns or max(1, int(ceil(sqrt(len(results)))))
+    rows = max(1, int(ceil(len(results) / columns)))
+    _initWorker()
+    sheet = QImage(columns * imgsize, rows * imgsize, QImage.Format_RGB32)
+    sheet.fill(Qt.black)
+    ptr = QPainter(sheet)
+    index = {}
+    drawn = 0
+    tasks = [(r, imgsize, None) for r in results]
+    context = get_context('spawn')
+    with context.Pool(jobs, initializer=_initWorker) as pool:
+        for i, (name, data) in enumerate(zip(
+                _outputNames(results),
+                pool.imap(_renderResult, tasks, chunksize=16))):
+            if data is None:
+                continue
+            x, y = (i % columns) * imgsize, (i // columns) * imgsize
+            ptr.drawImage(x, y, QImage.fromData(data, 'PNG'))
+            index[name] = [x, y, imgsize, imgsize]
+            drawn += 1
+    ptr.end()
+    if not sheet.save(sheetpath, 'PNG'):
+        raise IOError("could not write " + sheetpath)
+    with open(os.path.splitext(sheetpath)[0] + '.json', 'w') as f:
+        json.dump({'size': imgsize, 'columns': columns, 'boards': index},
+                  f, indent=1)
+    return drawn
+
+
+def _main(argv):
+    import argparse
+    from flowresults import readResults
+    parser = argparse.ArgumentParser(
+        description="Render thumbnails of boards in results files.")
+    parser.add_argument('results', nargs='+')
+    parser.add_argument('-s', '--size', type=int, default=128,
+                        help="thumbnail width and height in pixels")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes, default one per cpu")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('-o', '--outdir')
+    target.add_argument('--sheet')
+    parser.add_argument('-c', '--columns', type=int, default=None)
+    args = parser.parse_args(argv[1:])
+    results = [r for path in args.results for r in readResults(path)]
+    if args.sheet:
+        n = renderSheet(results, args.sheet, args.size, args.jobs,
+                        args.columns)
+    else:
+        n = renderFiles(results, args.outdir, args.size, args.jobs)
+    print("{0} of {1} boards rendered".format(n, len(results)))
+    return 0 if n == len(results) else 1
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import json
+
+
+class FlowResult(object):
+    """
+        Outcome of solving one board file, stored as a line of JSON:
+        {"board": path, "solved": bool, "visited": int, "seconds": float,
+         "flows": [[key, [[x, y], ...]], ...]}
+        getFlows() and solved let it be painted in place of a solver.
+    """
+
+    def __init__(self, boardfile, solved, flows, visited=None,
+                 seconds=None):
+        self._boardfile = boardfile
+        self._solved = solved
+        self._flows = [(k, [tuple(cell) for cell in cells])
+                       for k, cells in flows]
+        self._visited = visited
+        self._seconds = seconds
+
+    @staticmethod
+    def fromSolver(boardfile, solver, seconds=None):
+        """solver is a FlowBoardSolver, or anything with its getFlows()"""
+        return FlowResult(boardfile, solver.solved, solver.getFlows(),
+                          solver.statesVisited, seconds)
+
+    @staticmethod
+    def fromJson(line):
+        d = json.loads(line)
+        return FlowResult(d['board'], d['solved'], d['flows'],
+                          d.get('visited'), d.get('seconds'))
+
+    def toJson(self):
+        return json.dumps({
+            'board': self._boardfile,
+            'solved': self._solved,
+            'visited': self._visited,
+            'seconds': self._seconds,
+            'flows': self._flows}, separators=(',', ':'))
+
+    @property
+    def boardFile(self):
+        return self._boardfile
+
+    @property
+    def solved(self):
+        return self._solved
+
+    @property
+    def visited(self):
+        return self._visited
+
+    @property
+    def seconds(self):
+        return self._seconds
+
+    def getFlows(self):
+        return iter(self._flows)
+
+
+def appendResult(filepath, result):
+    with open(filepath, 'a') as f:
+        f.write(result.toJson() + '\n')
+
+
+def readResults(filepath):
+    with open(filepath) as f:
+        for line in f:
+            if line.strip():
+                yield FlowResult.fromJson(line)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+"""
+    Solve boards without a GUI. Imports only flowboard, flowsolver and
+    graph, so short-lived workers don't pay for Qt; flowsolverapp -b
+    forwards here.
+
+    flowsolve.py [-o ordering] [-c] [-m] [-r resultsfile] boards...
+        solve each board, printing the cpu time taken and statistics
+        -c saves progress to board.checkpoint every minute, and resumes
+           from it if it exists
+        -m traces memory use, reporting bytes per frame and the peak
+        -r appends each board's flows to resultsfile, see flowresults
+    flowsolve.py -p [--specs specs] [-t seconds] [-r resultsfile] boards...
+        race the solvers configured by specs, comma separated, see
+        portfolioSolver, each in its own process, keeping the first to
+        settle each board; print which won, and how often each did.
+        specs defaults to DEFAULT_PORTFOLIO
+    flowsolve.py -i [-n runs] [--budget ms]
+        time importing this module in fresh interpreters, best of runs,
+        and fail if it takes over budget milliseconds or pulls in Qt,
+        psutil or any GUI module
+"""
+
+import os
+import sys
+from time import time
+from flowboard import FlowBoard, FlowBoardSolver
+from flowsolver import FlowSolver, BestFirstFlowSolver, moveOrderings
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# modules of this tree which importing flowsolve may load
+HEADLESS_MODULES = ('flowsolve', 'flowboard', 'flowsolver', 'graph')
+
+# other packages which must only be imported once actually needed
+LAZY_MODULES = ('PyQt5', 'psutil')
+
+# solver configurations raced by default, see portfolioSolver
+DEFAULT_PORTFOLIO = ('eccentricity', 'mobility', 'closest', 'random:1',
+                     'eccentricity+unique', 'eccentricity+bestfirst')
+
+
+def benchmark(boardfile, ordering=None, checkpoint=False, memory=False,
+              resultsfile=None):
+    print("\n" + boardfile)
+    board = FlowBoard.parseFile(boardfile)
+    if board is None:
+        return
+    from os import path, remove
+    import tracemalloc
+    from psutil import Process
+    this = Process()
+    solver = FlowBoardSolver(board, ordering=ordering)
+    checkpointfile = boardfile + '.checkpoint'
+    if checkpoint and path.exists(checkpointfile):
+        solver.loadCheckpoint(checkpointfile)
+        print("resumed from " + checkpointfile)
+    if memory:
+        tracemalloc.start()
+    framesizes = []
+    framesheld = 0
+    cputime = this.cpu_times().user
+    if checkpoint or memory:
+        saved = time()
+        while not solver.run(1000):
+            if memory:
+                size = solver.measureFrameSize()
+                if size is not None:
+                    framesizes.append(size)
+                framesheld = max(framesheld, solver.framesHeld)
+            if checkpoint and time() - saved > 60:
+                solver.saveCheckpoint(checkpointfile)
+                saved = time()
+        if checkpoint and path.exists(checkpointfile):
+            remove(checkpointfile)
+    else:
+        solver.run()
+    cputime = this.cpu_times().user - cputime
+    print("{:.2f} seconds".format(cputime))
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if framesizes:
+            print("{:.0f} bytes per frame".format(
+                sum(framesizes) / len(framesizes)))
+        print("{} frames held at most".format(framesheld))
+        print("{:.1f} MB peak traced".format(peak / 1e6))
+    solver.printStats()
+    if resultsfile:
+        from flowresults import FlowResult, appendResult
+        appendResult(resultsfile,
+                     FlowResult.fromSolver(boardfile, solver, cputime))
+
+
+def _parseSpec(spec):
+    options = spec.split('+')
+    name, _, seed = options.pop(0).partition(':')
+    if name not in moveOrderings:
+        raise ValueError("unknown ordering in " + spec)
+    if seed and name != 'random':
+        raise ValueError("only the random ordering takes a seed: " + spec)
+    unknown = set(options) - {'unique', 'bestfirst'}
+    if unknown or len(set(options)) > 1:
+        raise ValueError("unknown or conflicting options in " + spec)
+    return name, int(seed or 0), set(options)
+
+
+def portfolioSolver(puzzle, spec):
+    """
+        Return a solver for puzzle configured by spec, a string of the
+        form ordering[:seed][+unique|+bestfirst]: the name of a move
+        ordering in flowsolver.moveOrderings, with a seed if random,
+        then optionally assuming the solution is unique or searching
+        best first.
+    """
+    name, seed, options = _parseSpec(spec)
+    if name == 'random':
+        ordering = moveOrderings[name](seed)
+    else:
+        ordering = moveOrderings[name]()
+    if 'bestfirst' in options:
+        return BestFirstFlowSolver(puzzle, ordering=ordering)
+    return FlowSolver(puzzle, 'unique' in options, ordering)
+
+
+def _raceWorker(puzzle, spec, conn):
+    """Solve puzzle as spec says and send how it went through conn."""
+    started = time()
+    solver = portfolioSolver(puzzle, spec)
+    solver.run()
+    _, _, options = _parseSpec(spec)
+    # failing to find a solution only proves there is none if nothing
+    # was pruned which might have led to one
+    conclusive = solver.solved or not (
+        'unique' in options or 'bestfirst' in options and solver.truncated)
+    conn.send((spec, solver.solved, conclusive, list(solver.getFlows()),
+               solver.statesVisited, time() - started))
+    conn.close()
+
+
+def solvePortfolio(puzzle, specs=DEFAULT_PORTFOLIO, seconds=None):
+    """
+        Race a solver for each of specs, see portfolioSolver, each in
+        its own process, and stop them all once one settles whether
+        puzzle has a solution. Return (spec, solved, flows, visited,
+        seconds) from that one, or None if none did within seconds.
+    """
+    from multiprocessing import get_context
+    from multiprocessing.connection import wait
+    for spec in specs:
+        _parseSpec(spec)
+    deadline = None if seconds is None else time() + seconds
+    context = get_context('spawn')
+    workers = {}  # connection : process
+    try:
+        for spec in specs:
+            conn, workerconn = context.Pipe(duplex=False)
+            worker = context.Process(target=_raceWorker,
+                                     args=(puzzle, spec, workerconn),
+                                     daemon=True)
+            worker.start()
+            workerconn.close()
+            workers[conn] = worker
+        pending = list(workers)
+        while pending:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - time())
+            ready = wait(pending, timeout)
+            if not ready:
+                return None
+            for conn in ready:
+                pending.remove(conn)
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    continue
+                spec, solved, conclusive, flows, visited, elapsed = result
+                if conclusive:
+                    return spec, solved, flows, visited, elapsed
+        return None
+    finally:
+        for conn, worker in workers.items():
+            worker.terminate()
+            worker.join()
+            conn.close()
+
+
+def _racePortfolio(boardfiles, specs, seconds=None, resultsfile=None):
+    wins = dict.fromkeys(specs, 0)
+    for boardfile in boardfiles:
+        board = FlowBoard.parseFile(boardfile)
+        if board is None or not board.isValid():
+            print("{0}: not a valid board".format(boardfile))
+            continue
+        puzzle, cellmap = board.getPuzzle()
+        result = solvePortfolio(puzzle, specs, seconds)
+        if result is None:
+            print("{0}: not settled".format(boardfile))
+            continue
+        spec, solved, flows, visited, elapsed = result
+        wins[spec] += 1
+        print("{0}: {1} by {2} in {3:.2f} seconds, {4} visited".format(
+            boardfile, 'solved' if solved else 'no solution', spec,
+            elapsed, visited))
+        if resultsfile:
+            from flowresults import FlowResult, appendResult
+            cellflows = [(board.endpointKeyAt(cellmap[flow[0]]),
+                          [cellmap[v] for v in flow]) for flow in flows]
+            appendResult(resultsfile, FlowResult(
+                boardfile, solved, cellflows, visited, elapsed))
+    for spec in sorted(wins, key=wins.get, reverse=True):
+        print("{0:5} {1}".format(wins[spec], spec))
+
+
+_IMPORT_PROBE = """
+import sys, time
+started = time.perf_counter()
+import {0}
+elapsed = time.perf_counter() - started
+import json
+json.dump([elapsed, sorted(sys.modules)], sys.stdout)
+"""
+
+
+def importTime(module='flowsolve', runs=5):
+    """
+        Import module in runs fresh interpreters and return the fastest
+        time in seconds, and the modules loaded by the last import.
+    """
+    import json
+    import subprocess
+    best = None
+    modules = []
+    for _ in range(runs):
+        out = subprocess.check_output(
+            [sys.executable, '-c', _IMPORT_PROBE.format(module)],
+            cwd=_HERE)
+        elapsed, modules = json.loads(out.decode())
+        best = elapsed if best is None else min(best, elapsed)
+    return best, modules
+
+
+def _treeModules():
+    for name in os.listdir(_HERE):
+        base, ext = os.path.splitext(name)
+        if ext == '.py' or os.path.exists(
+                os.path.join(_HERE, name, '__init__.py')):
+            yield base
+
+
+def _checkImports(runs, budget):
+    elapsed, modules = importTime('flowsolve', runs)
+    print("import flowsolve: {0:.1f} ms, best of {1}".format(
+        elapsed * 1e3, runs))
+    loaded = set(m.split('.')[0] for m in modules)
+    unwanted = (loaded & (set(_treeModules()) - set(HEADLESS_MODULES)) |
+                loaded & set(LAZY_MODULES))
+    for name in sorted(unwanted):
+        print("imports " + name)
+    ok = not unwanted
+    if budget is not None and elapsed * 1e3 > budget:
+        print("over budget of {0:.1f} ms".format(budget))
+        ok = False
+    return 0 if ok else 1
+
+
+def _main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Solve boards without a GUI.")
+    parser.add_argument('boards', nargs='*')
+    parser.add_argument('-o', '--ordering', default=None,
+                        help="move ordering, see flowsolver.moveOrderings")
+    parser.add_argument('-c', '--checkpoint', action='store_true')
+    parser.add_argument('-m', '--memory', action='store_true')
+    parser.add_argument('-r', '--results', default=None)
+    parser.add_argument('-p', '--portfolio', action='store_true',
+                        help="race solver configurations")
+    parser.add_argument('--specs', default=','.join(DEFAULT_PORTFOLIO),
+                        help="configurations raced by -p, comma separated")
+    parser.add_argument('-t', '--seconds', type=float, default=None,
+                        help="time allowed per board with -p")
+    parser.add_argument('-i', '--import-time', action='store_true',
+                        help="benchmark importing this module")
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None,
+                        help="import time allowed, in milliseconds")
+    args = parser.parse_args(argv[1:])
+    if args.import_time:
+        return _checkImports(args.runs, args.budget)
+    if not args.boards:
+        parser.error("no boards given")
+    if args.portfolio:
+        specs = args.specs.split(',')
+        try:
+            for spec in specs:
+                _parseSpec(spec)
+        except ValueError as e:
+            parser.error(str(e))
+        _racePortfolio(args.boards, specs, args.seconds, args.results)
+        return 0
+    for boardfile in args.boards:
+        benchmark(boardfile, args.ordering, args.checkpoint, args.memory,
+                  args.results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv))
@@ -1,10 +1,33 @@
 #!/usr/bin/env python
 
-from collections import deque
-from itertools import islice, chain, product
+from collections import deque, OrderedDict
+from itertools import islice, chain, product, count
 from functools import reduce
+from random import Random
+from time import time
+import heapq
+import os
 from graph import OnlineReducedGraph
 
+# entries kept by each cache used with cached()
+CACHE_SIZE = 64
+
+
+def cached(cache, key, build):
+    """
+        Return cache[key] from an OrderedDict used as a least recently
+        used cache, calling build() for it if missing.
+    """
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache[key] = value
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return value
+
 
 # A Flow puzzle consists of:
 #   * a simple graph
@@ -20,6 +43,11 @@ from graph import OnlineReducedGraph
 class FlowPuzzle(object):
     def __init__(self, graph, endpointPairs, exclusiveSets):
         self._graph = graph
+        self._vertexColors = None
+        parts = graph.bipartition()
+        if parts is not None:
+            self._vertexColors = dict.fromkeys(parts[0], 1)
+            self._vertexColors.update(dict.fromkeys(parts[1], -1))
         self._endpointPairs = endpointPairs
         self._exclusiveSets = exclusiveSets
         self._exclusionMap = {}
@@ -29,8 +57,10 @@ class FlowPuzzle(object):
                 if v not in self._exclusionMap:
                     self._exclusionMap[v] = set()
                 self._exclusionMap[v] |= es
+        self._exclusionMasks = {}  # vertex : exclusions as a bitmask
         for v, es in self._exclusionMap.items():
             es.remove(v)
+            self._exclusionMasks[v] = sum(1 << u for u in es)
 
     @property
     def graph(self):
@@ -46,6 +76,23 @@ class FlowPuzzle(object):
         """Sets of vertices. A path may include at most one from each set."""
         return iter(self._exclusiveSets)
 
+    @property
+    def vertexColors(self):
+        """
+            Dictionary of vertex to +1 or -1 such that adjacent vertices
+            have different colors, or None if the graph is not bipartite.
+        """
+        return self._vertexColors
+
+    def fingerprint(self):
+        """Return a string identifying this puzzle, to match saved state."""
+        data = repr((sorted(self._graph.vertices),
+                     sorted(self._graph.edges),
+                     sorted(tuple(sorted(ep)) for ep in self._endpointPairs),
+                     sorted(sorted(es) for es in self._exclusiveSets)))
+        import hashlib
+        return hashlib.sha1(data.encode()).hexdigest()
+
     def exclusions(self, v):
         """
             For vertex v, return the vertices which cannot be included
@@ -53,23 +100,162 @@ class FlowPuzzle(object):
         """
         return self._exclusionMap.get(v, None)
 
+    def exclusionMask(self, v):
+        """
+            Return exclusions(v) as a bitmask, with bit u set for each
+            vertex u, or 0 if there are none.
+        """
+        return self._exclusionMasks.get(v, 0)
+
+
+class MoveOrdering(object):
+    """
+        Decides which path head a search frame branches on and the order
+        its moves are tried in. Moves which are forced, or which are the
+        only way to reach a leaf, are taken before an ordering is asked.
+    """
+
+    def choose(self, frame, movesets):
+        """
+            movesets: nonempty list of (vidx, set of vertices to move to)
+            Return (vidx, moves), moves being every vertex in the moveset
+            for vidx in the order to try them.
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def _fewestMoves(movesets):
+        least = min(len(moves) for _, moves in movesets)
+        return [ms for ms in movesets if len(ms[1]) == least]
+
+
+class EccentricityOrdering(MoveOrdering):
+    """
+        Prefer heads with fewest moves, whose partners are farthest from
+        the rest of the open vertices, and try the most remote moves first.
+    """
+
+    def choose(self, frame, movesets):
+        graph = frame.reducedGraph
+
+        # focus on moving into the smallest biconnected component
+        # not sure why this helps as much as it does
+        bcs, _ = graph.biconnectedComponents()
+        if len(bcs) > 1:
+            focus = min(bcs, key=len)
+            focusmovesets = [ms for ms in movesets if ms[1] & focus]
+            movesets = focusmovesets or movesets
+
+        movesets = self._fewestMoves(movesets)
+        eccs = {}
+        for vidx, _ in movesets:
+            v = frame.partnerOf(vidx)
+            eccs[v] = graph.hyperEccentricity(v)
+        vidx, moves = max(movesets, key=lambda m: eccs[frame.partnerOf(m[0])])
+        for v in moves:
+            eccs[v] = graph.hyperEccentricity(v)
+        return vidx, sorted(moves, key=lambda v: eccs[v], reverse=True)
+
+
+class MobilityOrdering(MoveOrdering):
+    """
+        Fail first: take the head with fewest moves and try the moves
+        into the tightest spots first.
+    """
+
+    def choose(self, frame, movesets):
+        graph = frame.reducedGraph
+        vidx, moves = self._fewestMoves(movesets)[0]
+        return vidx, sorted(moves, key=lambda v: len(graph.adjacencies(v)))
+
+
+class ClosestOrdering(MoveOrdering):
+    """
+        Take the head with fewest moves which is nearest its partner,
+        and head straight for the partner first.
+    """
+
+    def choose(self, frame, movesets):
+        graph = frame.reducedGraph
+        movesets = self._fewestMoves(movesets)
+        vidx, moves = min(movesets, key=lambda m: graph.hyperDistance(
+            frame.headOf(m[0]), graph.adjacencies(frame.partnerOf(m[0]))))
+        ordered = graph.sortClosest(moves, frame.partnerOf(vidx))
+        ordered.extend(moves.difference(ordered))
+        return vidx, ordered
+
+
+class RandomOrdering(MoveOrdering):
+    """
+        Take a random head among those with fewest moves, and try its
+        moves in random order. Repeatable for a given seed.
+    """
+
+    def __init__(self, seed=0):
+        self._random = Random(seed)
+
+    def choose(self, frame, movesets):
+        vidx, moves = self._random.choice(self._fewestMoves(movesets))
+        moves = sorted(moves)
+        self._random.shuffle(moves)
+        return vidx, moves
+
+
+moveOrderings = {
+    'eccentricity': EccentricityOrdering,
+    'mobility': MobilityOrdering,
+    'closest': ClosestOrdering,
+    'random': RandomOrdering,
+}
+
 
 class FlowSolver(object):
 
     class _Frame(object):
 
+        OPEN = -1
+        CLOSED = -2
+
+        # Many frames are held at once, as pending children on the stack
+        __slots__ = ('_puzzle', '_graph', '_reducedgraph', '_headpairs',
+                     '_commoncomponents', '_blocks', '_positions',
+                     '_ordering', '_focus', '_focusroot', '_nextfocus',
+                     '_nextmoves', '_branches', '_aborted',
+                     '_solutionbelow', '_conflict', '_coverstate',
+                     '_partners', '_moveapplied', '_movetouched')
+
         def __init__(self, puzzle, reducedgraph,
-                     headpairs, commoncomponents, blocks):
+                     headpairs, commoncomponents, blocks, positions=None,
+                     focus=None, focusroot=None, ordering=None):
             self._puzzle = puzzle
             self._graph = self._puzzle.graph
             self._reducedgraph = reducedgraph
             self._headpairs = headpairs
             self._commoncomponents = commoncomponents
+            # self._blocks  per pair, bitmask of vertices its path can't
+            #               include, as it includes one of their exclusions
             self._blocks = blocks
-            self._nextframes = None
+            self._positions = positions
+            self._ordering = ordering or EccentricityOrdering()
+            # self._focus  open vertices of the group of pairs being solved
+            #              independently of the rest, or None
+            # self._focusroot  frame where that group was chosen
+            self._focus = focus
+            self._focusroot = focusroot
+            self._nextfocus = (focus, focusroot)
+            # self._nextmoves  (vidx, to) of children not yet taken, which
+            #                  are only built when taken
+            self._nextmoves = None
+            self._branches = 0
             self._aborted = False
+            self._solutionbelow = False
+            # self._conflict  vertices whose state the failure of this
+            #                 frame depends on, None for the whole state
+            self._conflict = None
             self._coverstate = None
+            self._partners = None
             self._moveapplied = None
+            self._movetouched = ()
 
         @property
         def moveApplied(self):
@@ -84,12 +270,109 @@ class FlowSolver(object):
             if self.aborted:
                 return False
             self._generateNextFrames()
-            return len(self._nextframes) > 0
+            return len(self._nextmoves) > 0
 
         @property
         def aborted(self):
             return self._aborted
 
+        @property
+        def branching(self):
+            """Return (children taken, children generated)."""
+            if self._nextmoves is None:
+                return 0, 0
+            return self._branches - len(self._nextmoves), self._branches
+
+        @property
+        def failureRoot(self):
+            """
+                Return an earlier frame which is unsolvable if this one is,
+                or None. When this frame completes an independent group of
+                pairs, what remains is unchanged from where the group was
+                chosen, save for moves which every solution must make.
+            """
+            if self._focus is None or not self._headpairs or \
+               self._solutionbelow:
+                return None
+            for c in self._reducedgraph.components.values():
+                if next(iter(c)) in self._focus:
+                    return None
+            return self._focusroot
+
+        def forgetFocusRoot(self):
+            """
+                Drop the frames where focus groups were chosen, so they can
+                be freed. failureRoot can't find them afterwards.
+            """
+            self._focusroot = None
+            self._nextfocus = (self._nextfocus[0], None)
+
+        @property
+        def solutionBelow(self):
+            return self._solutionbelow
+
+        @property
+        def conflict(self):
+            return self._conflict
+
+        def markSolution(self):
+            """Record that a solution was found below this frame."""
+            self._solutionbelow = True
+            self._conflict = None
+
+        def addConflict(self, conflict):
+            """Record the conflict set of a failed child frame."""
+            if self._conflict is not None:
+                if conflict is None:
+                    self._conflict = None
+                else:
+                    self._conflict = self._conflict | conflict
+
+        @property
+        def reducedGraph(self):
+            return self._reducedgraph
+
+        def headOf(self, vidx):
+            """Return the head moved by moves for vidx."""
+            return self._headpairs[vidx // 2][vidx % 2]
+
+        def partnerOf(self, vidx):
+            """Return the head that the head for vidx is to be joined to."""
+            return self._headpairs[vidx // 2][1 - vidx % 2]
+
+        @property
+        def openVertices(self):
+            return self._reducedgraph.vertices
+
+        @property
+        def partners(self):
+            """Return dict of head : head it is to be connected to."""
+            if self._partners is None:
+                self._partners = {}
+                for v1, v2 in self._headpairs:
+                    self._partners[v1] = v2
+                    self._partners[v2] = v1
+            return self._partners
+
+        def vertexState(self, v):
+            """Return OPEN, CLOSED, or the partner of the head at v."""
+            if v in self._reducedgraph.vertices:
+                return self.OPEN
+            return self.partners.get(v, self.CLOSED)
+
+        def touchedStates(self):
+            """Return (vertex, state) for each vertex the move changed."""
+            if not self._movetouched:
+                return ()
+            head, to, other = self._movetouched
+            if to == other:
+                return (head, self.CLOSED), (to, self.CLOSED)
+            return (head, self.CLOSED), (to, other), (other, to)
+
+        def moveTouches(self, vertices):
+            """Return True if the applied move changed any of vertices."""
+            return any(v in vertices for v in self._movetouched)
+
         @property
         def openSize(self):
             """Return number of unsolved vertices"""
@@ -104,7 +387,7 @@ class FlowSolver(object):
             if self._coverstate is None:
                 headstate = []
                 for hp, blocks in zip(self._headpairs, self._blocks):
-                    headstate.append((hp, tuple(blocks)) if blocks else hp)
+                    headstate.append((hp, blocks) if blocks else hp)
                 headstate = frozenset(headstate)
                 self._coverstate = \
                     (headstate, frozenset(self._reducedgraph.vertices))
@@ -116,7 +399,8 @@ class FlowSolver(object):
         def copy(self, move=None):
             frame = self.__class__(self._puzzle, self._reducedgraph,
                                    self._headpairs, self._commoncomponents,
-                                   self._blocks)
+                                   self._blocks, self._positions,
+                                   *self._nextfocus, ordering=self._ordering)
             if move:
                 frame.applyMove(*move)
             return frame
@@ -127,6 +411,7 @@ class FlowSolver(object):
             oldpair = self._headpairs[pairidx]
             head, other = oldpair[subidx], oldpair[1 - subidx]
             self._moveapplied = (head, to)
+            self._movetouched = (head, to, other)
             self._headpairs = list(self._headpairs)
             self._commoncomponents = list(self._commoncomponents)
             if to == other:
@@ -134,13 +419,22 @@ class FlowSolver(object):
                 self._commoncomponents.pop(pairidx)
                 self._blocks = list(self._blocks)
                 self._blocks.pop(pairidx)
+                if self._positions is not None:
+                    self._positions = list(self._positions)
+                    self._positions.pop(pairidx)
             else:
                 self._headpairs[pairidx] = \
                     (to, other) if to < other else (other, to)
-                if self._puzzle.exclusions(to):
+                if self._positions is not None:
+                    self._positions = list(self._positions)
+                    positions = self._positions[pairidx].copy()
+                    p = positions[head]
+                    positions[to] = p + 1 if p >= 0 else p - 1
+                    self._positions[pairidx] = positions
+                blocks = self._puzzle.exclusionMask(to)
+                if blocks:
                     self._blocks = list(self._blocks)
-                    self._blocks[pairidx] = \
-                        self._blocks[pairidx] | self._puzzle.exclusions(to)
+                    self._blocks[pairidx] |= blocks
                 self._reducedgraph = self._reducedgraph.copy()
                 self._closeVertex(to)
 
@@ -222,6 +516,11 @@ class FlowSolver(object):
                     return True
                 covered |= common
             if len(covered) != len(self._reducedgraph.components):
+                for k, c in self._reducedgraph.components.items():
+                    if k not in covered:
+                        if not self._candidatePairs(c):
+                            self._conflict = self._componentConflict(c)
+                        break
                 return True
 
             # check if any open vertex is adjacent only to
@@ -237,6 +536,7 @@ class FlowSolver(object):
                 x = len(self._graph.adjacencies(v, active))
                 assert x > 0
                 if x == 1:
+                    self._conflict = {v} | self._graph.adjacencies(v)
                     return True
 
             return False
@@ -244,44 +544,156 @@ class FlowSolver(object):
         def biconnectedUnsolvable(self):
             if not self._reducedgraph.separatorsChanged:
                 return False  # assume parent frames have been checked
-            bf, bfmap, bfseps = self._reducedgraph.blockForest()
-            bf_covered = set()
-            bfseps_used = set()
+            bcf = self._reducedgraph.blockCutForest()
+            bcf_covered = 0
+            bcfseps_used = 0
             for cc, (v1, v2) in zip(self._commoncomponents, self._headpairs):
                 doconflict = len(cc) == 1 and not self._graph.adjacent(v1, v2)
                 for c_k in cc:
-                    v1_in = set(map(
-                        bfmap.get, self._reducedgraph.componentAdjacencies(v1, c_k)))
-                    v2_in = set(map(
-                        bfmap.get, self._reducedgraph.componentAdjacencies(v2, c_k)))
-                    pcommon = bfseps.copy() if doconflict else None
+                    v1_in = self._reducedgraph.blockCutNodes(
+                        self._reducedgraph.componentAdjacencies(v1, c_k))
+                    v2_in = self._reducedgraph.blockCutNodes(
+                        self._reducedgraph.componentAdjacencies(v2, c_k))
+                    pcommon = bcf.articulations
                     for a, b in product(v1_in, v2_in):
-                        p = set(bf.shortestPath(a, b))
-                        bf_covered |= p
-                        if doconflict:
-                            pcommon &= p
+                        p = bcf.pathMask(a, b)
+                        bcf_covered |= p
+                        pcommon &= p
                     if doconflict:
-                        if pcommon & bfseps_used:
+                        if pcommon & bcfseps_used:
                             return True
-                        bfseps_used |= pcommon
-            return not (set(bfmap.values()) - bfseps).issubset(bf_covered)
+                        bcfseps_used |= pcommon
+            uncovered = bcf.blocks & ~bcf_covered
+            if uncovered:
+                n = (uncovered & -uncovered).bit_length() - 1
+                c = self._reducedgraph.blockComponent(n)
+                covered = 0
+                for v1, v2 in self._candidatePairs(c):
+                    v1_in = self._reducedgraph.blockCutNodes(
+                        self._graph.adjacencies(v1, c))
+                    v2_in = self._reducedgraph.blockCutNodes(
+                        self._graph.adjacencies(v2, c))
+                    for a, b in product(v1_in, v2_in):
+                        covered |= bcf.pathMask(a, b)
+                if not covered & (1 << n):
+                    self._conflict = self._componentConflict(c)
+                return True
+            return False
+
+        def _candidatePairs(self, component):
+            # Pairs are committed to components by reasoning about the
+            # whole state, so to blame only the neighborhood of a component
+            # every pair which could reach it must be considered.
+            return [(v1, v2) for v1, v2 in self._headpairs
+                    if self._graph.adjacencies(v1, component) and
+                    self._graph.adjacencies(v2, component)]
+
+        def _componentConflict(self, component):
+            # Covering a component depends only on the component, the
+            # vertices around it, and the partners of heads among those.
+            conflict = set(component)
+            for v in component:
+                conflict |= self._graph.adjacencies(v)
+            for v in list(conflict):
+                p = self.vertexState(v)
+                if p >= 0:
+                    conflict.add(p)
+            return conflict
+
+        def colorUnsolvable(self):
+            # On a bipartite graph paths alternate colors. A path between
+            # two heads of the same color covers one more open vertex of
+            # the opposite color, otherwise it covers equal numbers.
+            # Each component's balance must be made up by the pairs
+            # which can pass through it.
+            colors = self._puzzle.vertexColors
+            if colors is None:
+                return False
+            low = dict.fromkeys(self._reducedgraph.components, 0)
+            high = low.copy()
+            for common, (v1, v2) in zip(self._commoncomponents,
+                                        self._headpairs):
+                need = -(colors[v1] + colors[v2]) // 2
+                if not need:
+                    continue
+                if len(common) == 1:
+                    k, = common
+                    low[k] += need
+                    high[k] += need
+                else:
+                    for k in common:
+                        if need > 0:
+                            high[k] += need
+                        else:
+                            low[k] += need
+            for k in low:
+                if not low[k] <= self._reducedgraph.componentBalance(k) \
+                        <= high[k]:
+                    return True
+            return False
 
         def takeNextFrame(self):
             assert not self.aborted
             self._generateNextFrames()
-            return self._nextframes.popleft()
+            return self.copy(self._nextmoves.popleft())
+
+        def pendingMoves(self):
+            """Return moves (head, to) of children not yet taken, or None."""
+            if self._nextmoves is None:
+                return None
+            return [(self._headpairs[vidx // 2][vidx % 2], to)
+                    for vidx, to in self._nextmoves]
 
-        def abort(self):
-            assert self._nextframes is None
+        def moveHead(self, head, to):
+            """Return a new frame with head moved to 'to'."""
+            return self.copy((self._headIndex(head), to))
+
+        def _headIndex(self, head):
+            for pairidx, pair in enumerate(self._headpairs):
+                if head in pair:
+                    return 2 * pairidx + pair.index(head)
+            raise KeyError(head)
+
+        def restoreNextFrames(self, moves, taken):
+            """
+                Set the children still to be taken, from a checkpoint.
+                moves: list of (head, to)
+            """
+            assert self._nextmoves is None
+            self._nextmoves = deque((self._headIndex(head), to)
+                                    for head, to in moves)
+            self._branches = taken + len(moves)
+            # what the children already taken failed on is lost
+            self._conflict = None
+
+        def abort(self, conflict=None):
+            assert self._nextmoves is None
             self._aborted = True
+            if conflict is not None:
+                self._conflict = conflict
 
         def _generateNextFrames(self):
-            if self._nextframes is None:
-                self._nextframes = \
-                    deque(self.copy(m) for m in self._bestMoves())
+            if self._nextmoves is None:
+                moves = list(self._bestMoves())
+                self._conflict = self._branchConflict(moves)
+                self._nextmoves = deque(moves)
+                self._branches = len(moves)
 
-        def _resolveVidx(self, vidx):
-            return self._headpairs[vidx // 2][1 - vidx % 2]
+        def _branchConflict(self, moves):
+            # If the moves are every way one head could be extended, then
+            # their all failing depends only on that head's surroundings
+            # and on what each of them failed on.
+            if not moves:
+                return None
+            pairidx, subidx = divmod(moves[0][0], 2)
+            head = self._headpairs[pairidx][subidx]
+            other = self._headpairs[pairidx][1 - subidx]
+            options = self._reducedgraph.adjacencies(head)
+            if self._graph.adjacent(head, other):
+                options.add(other)
+            if options != set(to for _, to in moves):
+                return None
+            return {head, other} | self._graph.adjacencies(head)
 
         def _bestMoves(self):
             movesets = self._possibleMoves()
@@ -294,30 +706,55 @@ class FlowSolver(object):
                 if len(moves) == 1:
                     return ((vidx, to) for to in moves)
 
-            # focus on moving into the smallest biconnected component
-            # not sure why this helps as much as it does
-            bcs, _ = self._reducedgraph.biconnectedComponents()
-            if len(bcs) > 1:
-                focus = min(bcs, key=len)
-                assert isinstance(focus, set)
-                focusmovesets = [ms for ms in movesets if ms[1] & focus]
-                movesets = focusmovesets or movesets
-
-            # consider only endpoints with minimum possible moves
-            movesets = sorted(movesets, key=lambda ms: len(ms[1]))
-            while len(movesets[0][1]) != len(movesets[-1][1]):
-                movesets.pop()
-
-            eccs = {}
-            for vidx, _ in movesets:
-                v = self._resolveVidx(vidx)
-                eccs[v] = self._reducedgraph.hyperEccentricity(v)
-            vidx, moves = max(movesets, key=lambda m: eccs[self._resolveVidx(m[0])])
-            for v in moves:
-                eccs[v] = self._reducedgraph.hyperEccentricity(v)
-            moves = sorted(moves, key=lambda v: eccs[v], reverse=True)
+            movesets = self._focusMovesets(movesets)
+            vidx, moves = self._ordering.choose(self, movesets)
             return ((vidx, to) for to in moves)
 
+        def _independentGroups(self):
+            """
+                Return list of (pair indexes, component keys) partitioning
+                the pairs by the components they may use.
+            """
+            groups = []
+            for i, common in enumerate(self._commoncomponents):
+                if not common:
+                    continue
+                pairs, keys = {i}, set(common)
+                for group in groups[:]:
+                    if group[1] & keys:
+                        pairs |= group[0]
+                        keys |= group[1]
+                        groups.remove(group)
+                groups.append((pairs, keys))
+            return groups
+
+        def _focusMovesets(self, movesets):
+            # Pairs using disjoint sets of components can't interfere.
+            # Solve one such group at a time, so a failure in one isn't
+            # rediscovered under every arrangement of the others.
+            focus, focusroot = self._focus, self._focusroot
+            components = self._reducedgraph.components
+            groups = []
+            if self._reducedgraph.disjoint:
+                groups = self._independentGroups()
+            if focus is not None:
+                groups = [(pairs, keys) for pairs, keys in groups
+                          if next(iter(components[next(iter(keys))])) in focus]
+                if not groups:
+                    focus = focusroot = None
+                    groups = self._independentGroups()
+            if len(groups) > 1:
+                pairs, keys = min(groups, key=lambda g:
+                                  sum(len(components[k]) for k in g[1]))
+                focus = set().union(*(components[k] for k in keys))
+                focusroot = self
+            elif groups:
+                pairs = groups[0][0]
+            self._nextfocus = (focus, focusroot)
+            if focus is None:
+                return movesets
+            return [ms for ms in movesets if ms[0] // 2 in pairs] or movesets
+
         def _possibleMoves(self):
             if not self._headpairs:
                 return None
@@ -327,12 +764,18 @@ class FlowSolver(object):
                 if common:
                     m1 = self._reducedgraph.componentsAdjacencies(v1, common)
                     m2 = self._reducedgraph.componentsAdjacencies(v2, common)
-                    if self._blocks[pairidx]:
-                        m1 -= self._blocks[pairidx]
-                        m2 -= self._blocks[pairidx]
+                    blocks = self._blocks[pairidx]
+                    if blocks:
+                        m1 = set(to for to in m1 if not blocks >> to & 1)
+                        m2 = set(to for to in m2 if not blocks >> to & 1)
                     if self._graph.adjacent(v1, v2):
                         m1.add(v2)
                         m2.add(v1)
+                    if self._positions is not None:
+                        m1 = set(to for to in m1
+                                 if not self._reroutable(pairidx, v1, to))
+                        m2 = set(to for to in m2
+                                 if not self._reroutable(pairidx, v2, to))
                     if not m1 or not m2:
                         return None
                 elif not self._graph.adjacent(v1, v2):
@@ -350,6 +793,34 @@ class FlowSolver(object):
                 movesets.append(ms2)
             return movesets
 
+        def _reroutable(self, pairidx, head, to):
+            """
+                Return True if moving head to 'to' would make its path run
+                along opposite sides of a square in the same direction.
+                That path could be rerouted through the same vertices,
+                giving another solution, so a puzzle with a unique
+                solution never contains one.
+            """
+            # Positions count up from the pair's first endpoint and down
+            # from its second (-1), so (p < 0, p) orders the whole path.
+            positions = self._positions[pairidx]
+            p = positions[head]
+            p_to = positions.get(to, p + 1 if p >= 0 else p - 1)
+            forward = (p < 0, p) < (p_to < 0, p_to)
+            toadj = self._graph.adjacencies(to)
+            for z in self._graph.adjacencies(head):
+                p_z = positions.get(z)
+                if p_z is None or z == to:
+                    continue
+                for y in self._graph.adjacencies(z) & toadj:
+                    p_y = positions.get(y)
+                    if p_y is None or y == head or abs(p_y - p_z) != 1 or \
+                       (p_y < 0) != (p_z < 0):
+                        continue
+                    if ((p_z < 0, p_z) < (p_y < 0, p_y)) == forward:
+                        return True
+            return False
+
         def _leafMove(self, movesets):
             """return (vidx, move) or None"""
             # Look for a move to an open vertex which is adjacent only to
@@ -367,29 +838,53 @@ class FlowSolver(object):
                     return vidxs[0], leaf
             return None
 
+        # Initial states of recently solved puzzles, and reduced graphs of
+        # their graphs before endpoints are masked. Frames copy what they
+        # change, so these can be shared by any number of searches.
+        # _initialStates  puzzle : (reducedgraph, headpairs, components)
+        # _unmaskedGraphs  graph : reducedgraph
+        _initialStates = OrderedDict()
+        _unmaskedGraphs = OrderedDict()
+
         @classmethod
-        def initial(cls, puzzle):
+        def initial(cls, puzzle, assumeUnique=False, ordering=None):
+            state = cached(cls._initialStates, puzzle,
+                           lambda: cls._initialState(puzzle))
+            reducedgraph, headpairs, commoncomponents = state
+            blocks = [0] * len(headpairs)
+            positions = None
+            if assumeUnique:
+                positions = [{v1: 0, v2: -1} for v1, v2 in headpairs]
+            return cls(puzzle, reducedgraph,
+                       headpairs, commoncomponents, blocks, positions,
+                       ordering=ordering)
+
+        @classmethod
+        def _initialState(cls, puzzle):
             headpairs = [tuple(sorted(ep)) for ep in puzzle.endpointPairs]
-            reducedgraph = OnlineReducedGraph(puzzle.graph)
+            reducedgraph = cached(
+                cls._unmaskedGraphs, puzzle.graph,
+                lambda: OnlineReducedGraph(puzzle.graph,
+                                           colors=puzzle.vertexColors))
+            reducedgraph = reducedgraph.copy()
+            # built once here, then kept up to date by every frame's moves
+            reducedgraph.blockCutForest()
             for v in chain(*headpairs):
                 reducedgraph.maskVertex(v)
             commoncomponents = []
             for v1, v2 in headpairs:
                 commoncomponents.append(reducedgraph.adjacentComponents(v1) &
                                         reducedgraph.adjacentComponents(v2))
-            blocks = [set()] * len(headpairs)
-            return cls(puzzle, reducedgraph,
-                       headpairs, commoncomponents, blocks)
+            return reducedgraph, headpairs, commoncomponents
 
         @staticmethod
-        def recoverPaths(framestack):
-            if not framestack:
-                return []
-            pathpairs = [([v1], [v2]) for v1, v2 in framestack[0].headPairs]
-            for frame in framestack[1:]:
+        def tracePaths(headpairs, moves):
+            """Return paths made by applying moves, (head, to), in order."""
+            pathpairs = [([v1], [v2]) for v1, v2 in headpairs]
+            for head, to in moves:
                 for path in chain(*pathpairs):
-                    if path[-1] == frame.moveApplied[0]:
-                        path.append(frame.moveApplied[1])
+                    if path[-1] == head:
+                        path.append(to)
                         break
             paths = []
             for p1, p2 in pathpairs:
@@ -400,7 +895,56 @@ class FlowSolver(object):
                     paths.append(p2)
             return paths
 
+    class _Paths(object):
+        """
+            Paths drawn by the moves of the frames on the stack, kept up
+            to date as frames are pushed and popped.
+        """
+
+        def __init__(self, headpairs):
+            # self._fragments  path from each endpoint, two per pair
+            # self._fragmentAt  head : index of the fragment ending there
+            # self._pushed  index of the fragment extended by each push
+            self._fragments = []
+            self._fragmentAt = {}
+            for pair in headpairs:
+                for v in pair:
+                    self._fragmentAt[v] = len(self._fragments)
+                    self._fragments.append([v])
+            self._pushed = []
+
+        def push(self, move):
+            head, to = move
+            i = self._fragmentAt.pop(head)
+            self._fragments[i].append(to)
+            # where a pair joins, to stays the partner fragment's head
+            self._fragmentAt.setdefault(to, i)
+            self._pushed.append(i)
+
+        def pop(self):
+            i = self._pushed.pop()
+            fragment = self._fragments[i]
+            to = fragment.pop()
+            if self._fragmentAt[to] == i:
+                del self._fragmentAt[to]
+            self._fragmentAt[fragment[-1]] = i
+
+        def paths(self):
+            """Return a new list of paths, joining completed pairs."""
+            paths = []
+            for i in range(0, len(self._fragments), 2):
+                p1, p2 = self._fragments[i], self._fragments[i + 1]
+                if p1[-1] == p2[-1]:
+                    paths.append(p1[:-1] + p2[::-1])
+                else:
+                    paths.append(list(p1))
+                    paths.append(list(p2))
+            return paths
+
     class _Memo(object):
+        __slots__ = ('_memosByDepth', '_inserts', '_finds', '_hits',
+                     '_limit')
+
         def __init__(self):
             self._memosByDepth = {}
             self._inserts = 0
@@ -422,6 +966,49 @@ class FlowSolver(object):
                 memo[frame.coverState] = self._finds
             return hit
 
+        def dump(self):
+            """Return contents as plain data for saving."""
+            memos = {}
+            for d, memo in self._memosByDepth.items():
+                entries = []
+                for (headstate, vertices), lastuse in memo.items():
+                    heads = []
+                    for hs in headstate:
+                        if isinstance(hs[0], tuple):
+                            blocks = hs[1]
+                            heads.append(list(hs[0]) + [
+                                [v for v in range(blocks.bit_length())
+                                 if blocks >> v & 1]])
+                        else:
+                            heads.append(list(hs))
+                    mask = sum(1 << v for v in vertices)
+                    entries.append([heads, format(mask, 'x'), lastuse])
+                memos[str(d)] = entries
+            return {'memos': memos, 'inserts': self._inserts,
+                    'finds': self._finds, 'hits': self._hits}
+
+        def load(self, data):
+            """Restore contents from dump()."""
+            self._memosByDepth = {}
+            for d, entries in data['memos'].items():
+                memo = {}
+                for heads, mask, lastuse in entries:
+                    headstate = []
+                    for hs in heads:
+                        if len(hs) == 3:
+                            blocks = sum(1 << v for v in hs[2])
+                            headstate.append((tuple(hs[:2]), blocks))
+                        else:
+                            headstate.append(tuple(hs))
+                    mask = int(mask, 16)
+                    vertices = frozenset(v for v in range(mask.bit_length())
+                                         if mask >> v & 1)
+                    memo[(frozenset(headstate), vertices)] = lastuse
+                self._memosByDepth[int(d)] = memo
+            self._inserts = data['inserts']
+            self._finds = data['finds']
+            self._hits = data['hits']
+
         def _getMemo(self, frame):
             d = frame.openSize
             memo = self._memosByDepth.setdefault(d, {})
@@ -433,6 +1020,10 @@ class FlowSolver(object):
                 self._memosByDepth[d] = memo
             return memo
 
+        @property
+        def hitRate(self):
+            return self._hits / float(self._finds) if self._finds else 0.0
+
         def stats(self):
             stats = "{0} inserts".format(self._inserts)
             if self._finds > 0 and self._inserts > 0:
@@ -441,12 +1032,118 @@ class FlowSolver(object):
                     self._hits / float(self._inserts))
             return stats
 
-    def __init__(self, puzzle):
-        self._stack = [self._Frame.initial(puzzle)]
-        if self._stack[-1].simpleUnsolvable():
+    class _Nogoods(object):
+        """
+            States of small sets of vertices which can't be part of any
+            solution, indexed by (vertex, state) so a frame is checked only
+            against those involving vertices its move changed.
+            Nogoods which include heads are indexed by their heads alone;
+            closed vertices are shared by too many of them to be worth
+            checking on, so a few matches are missed.
+        """
+
+        def __init__(self):
+            # entries : [conflict, open, closed, heads, last use]
+            self._nogoods = {}
+            self._index = {}  # (vertex, state) : list of entries
+            self._finds = 0
+            self._hits = 0
+            self._limit = 50000
+
+        def insert(self, frame, conflict):
+            entries = tuple(sorted((v, frame.vertexState(v))
+                                   for v in conflict))
+            if entries not in self._nogoods:
+                self._add(entries, self._finds)
+
+        def dump(self):
+            """Return contents as plain data for saving."""
+            return {'nogoods': [[[list(e) for e in entries], nogood[4]]
+                                for entries, nogood in self._nogoods.items()],
+                    'finds': self._finds, 'hits': self._hits}
+
+        def load(self, data):
+            """Restore contents from dump()."""
+            self._nogoods = {}
+            self._index = {}
+            for entries, lastuse in data['nogoods']:
+                self._add(tuple(tuple(e) for e in entries), lastuse)
+            self._finds = data['finds']
+            self._hits = data['hits']
+
+        def _add(self, entries, lastuse):
+            if len(self._nogoods) >= self._limit:
+                self._evict()
+            OPEN, CLOSED = FlowSolver._Frame.OPEN, FlowSolver._Frame.CLOSED
+            conflict = frozenset(v for v, _ in entries)
+            openset = frozenset(v for v, s in entries if s == OPEN)
+            closedset = frozenset(v for v, s in entries if s == CLOSED)
+            heads = tuple((v, s) for v, s in entries if s >= 0)
+            self._nogoods[entries] = [conflict,
+                                      openset, closedset, heads, lastuse]
+            self._addToIndex(entries, heads)
+
+        def find(self, frame):
+            """Return the conflict set of a nogood matching frame, or None."""
+            self._finds += 1
+            openvertices = frame.openVertices
+            for key in frame.touchedStates():
+                for entries in self._index.get(key, ()):
+                    partners = frame.partners
+                    nogood = self._nogoods[entries]
+                    conflict, openset, closedset, heads, _ = nogood
+                    if openset <= openvertices and \
+                       closedset.isdisjoint(openvertices) and \
+                       closedset.isdisjoint(partners) and \
+                       all(partners.get(u) == p for u, p in heads):
+                        self._hits += 1
+                        nogood[4] = self._finds
+                        return conflict
+            return None
+
+        def _evict(self):
+            keep = sorted(self._nogoods, key=lambda e: self._nogoods[e][4],
+                          reverse=True)[:3 * self._limit // 4]
+            self._nogoods = dict((e, self._nogoods[e]) for e in keep)
+            self._index = {}
+            for entries, nogood in self._nogoods.items():
+                self._addToIndex(entries, nogood[3])
+
+        def _addToIndex(self, entries, heads):
+            for entry in heads or entries:
+                self._index.setdefault(entry, []).append(entries)
+
+        def stats(self):
+            stats = "{0} stored".format(len(self._nogoods))
+            if self._finds > 0:
+                stats += ", {0:.2%} hit".format(
+                    self._hits / float(self._finds))
+            return stats
+
+    def __init__(self, puzzle, assumeUnique=False, ordering=None):
+        """
+            assumeUnique: the puzzle is known to have only one solution,
+            prune partial paths which could only lead to others
+            ordering: MoveOrdering, or name of one in moveOrderings
+        """
+        if isinstance(ordering, str):
+            ordering = moveOrderings[ordering]()
+        self._puzzle = puzzle
+        self._assumeUnique = assumeUnique
+        self._ordering = ordering
+        self._stack = [self._Frame.initial(puzzle, assumeUnique, ordering)]
+        self._paths = self._Paths(self._stack[0].headPairs)
+        if self._stack[-1].simpleUnsolvable() or \
+           self._stack[-1].colorUnsolvable() or \
+           self._stack[-1].biconnectedUnsolvable():
             self._stack = []
         self._totalframes = 1
+        self._backjumps = 0
+        self._backtracks = 0
+        self._maxdepth = len(self._stack)
+        self._branching = {}  # children : frames expanded with that many
         self._memo = self._Memo()
+        self._nogoods = self._Nogoods()
 
     @property
     def done(self):
@@ -460,6 +1157,59 @@ class FlowSolver(object):
     def statesVisited(self):
         return self._totalframes
 
+    @property
+    def progress(self):
+        """
+            Estimate the fraction of the search tree explored, 0 to 1.
+            Each frame on the stack splits what's left of the tree evenly
+            among its children, and those already taken are done.
+        """
+        if self.done:
+            return 1.0
+        explored = 0.0
+        share = 1.0
+        for frame in self._stack:
+            taken, total = frame.branching
+            if taken == 0:
+                break
+            explored += share * (taken - 1) / total
+            share /= total
+        return explored
+
+    @property
+    def framesHeld(self):
+        """
+            Return number of frames held, which are those on the stack,
+            as children waiting to be taken are kept as moves.
+        """
+        return len(self._stack)
+
+    def measureFrameSize(self):
+        """
+            Build the waiting children of the frame nearest the top of the
+            stack which has any, and return bytes allocated per child, or
+            None. Needs tracemalloc to be tracing.
+        """
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return None
+        for frame in reversed(self._stack):
+            moves = frame.pendingMoves()
+            if moves:
+                before = tracemalloc.get_traced_memory()[0]
+                children = [frame.moveHead(*m) for m in moves]
+                after = tracemalloc.get_traced_memory()[0]
+                return (after - before) / len(children)
+        return None
+
+    @property
+    def estimatedRemaining(self):
+        """Estimate the number of frames left to visit, or None."""
+        progress = self.progress
+        if progress <= 0.0:
+            return None
+        return int(self._totalframes * (1.0 - progress) / progress)
+
     def stateHash(self):
         return hash(self._immutableFlows())
 
@@ -468,11 +1218,20 @@ class FlowSolver(object):
             return False
         while self._stack[-1].hasNext:
             top = self._stack[-1].takeNextFrame()
-            self._stack.append(top)
+            self._pushFrame(top)
             self._totalframes += 1
-            if top.simpleUnsolvable() or self._memo.find(top):
+            taken, total = self._stack[-2].branching
+            if taken == 1:
+                self._branching[total] = self._branching.get(total, 0) + 1
+            if len(self._stack) > self._maxdepth:
+                self._maxdepth = len(self._stack)
+            if top.simpleUnsolvable() or top.colorUnsolvable():
                 top.abort()
                 return False
+            conflict = self._nogoods.find(top)
+            if conflict is not None or self._memo.find(top):
+                top.abort(conflict)
+                return False
             if top.biconnectedUnsolvable():
                 self._memo.insert(top)
                 top.abort()
@@ -485,11 +1244,50 @@ class FlowSolver(object):
             return False
         if self._stack[-1].hasNext:
             return False
-        popped = self._stack.pop()
-        if not popped.aborted:
+        popped = self._popFrame()
+        self._backtracks += 1
+        if not popped.aborted and not popped.solutionBelow:
             self._memo.insert(popped)
+        conflict = popped.conflict
+        if conflict is not None:
+            self._nogoods.insert(popped, conflict)
+        root = popped.failureRoot
+        while root is not None:
+            # the pairs set aside at root can't be solved, so nothing
+            # since then can be either, though frames above a solution
+            # found already are kept, as are their other moves
+            conflict = None
+            while not self._stack[-1].solutionBelow:
+                popped = self._popFrame()
+                if not popped.solutionBelow:
+                    self._memo.insert(popped)
+                if popped is root:
+                    root = popped.failureRoot
+                    break
+            else:
+                root = None
+        if conflict is not None:
+            # frames whose moves didn't change anything the failure
+            # depended on fail the same way
+            while self._stack and not popped.moveTouches(conflict) and \
+                    not self._stack[-1].solutionBelow:
+                popped = self._popFrame()
+                self._memo.insert(popped)
+                self._backjumps += 1
+        if self._stack:
+            self._stack[-1].addConflict(conflict)
         return True
 
+    def _pushFrame(self, frame):
+        self._stack.append(frame)
+        self._paths.push(frame.moveApplied)
+
+    def _popFrame(self):
+        frame = self._stack.pop()
+        if self._stack:
+            self._paths.pop()
+        return frame
+
     def run(self, limit=None):
         """limit is number of backtracks, not frames"""
         if self.done:
@@ -509,10 +1307,118 @@ class FlowSolver(object):
         return True
 
     def skipSolution(self):
+        # frames marked as having a solution below are never memoized,
+        # so the memo only holds states with no solution at all, which
+        # stay unsolvable, and it is kept to speed up the next search
         assert self.solved
+        for frame in self._stack:
+            frame.markSolution()
         while self.stepBack():
             pass
-        self._memo = self._Memo()
+
+    def solutions(self, count=None, frames=None, seconds=None):
+        """
+            Generator yielding (flows, stats) for each solution as it is
+            found, flows as a list from getFlows() and stats as from
+            statistics() plus 'solution', its number from 1, and 'frames',
+            the frames visited since the previous one.
+            Stops after count solutions, when there are no more, or when
+            over frames frames or seconds since the call, leaving done
+            False. A solution the solver is already stopped at is yielded
+            first, and the solver stays at the last solution yielded, so
+            the generator can be closed early.
+        """
+        deadline = None if seconds is None else time() + seconds
+        visited = self._totalframes
+        maxframes = None if frames is None else visited + frames
+        found = 0
+        while count is None or found < count:
+            while not self.run(20):
+                if deadline is not None and time() > deadline:
+                    return
+                if maxframes is not None and self._totalframes > maxframes:
+                    return
+            if not self.solved:
+                return
+            found += 1
+            stats = self.statistics()
+            stats['solution'] = found
+            stats['frames'] = self._totalframes - visited
+            visited = self._totalframes
+            yield list(self.getFlows()), stats
+            if found == count:
+                return
+            self.skipSolution()
+
+    def saveCheckpoint(self, filepath):
+        """
+            Write the state of the search to filepath, so it can be
+            continued by loadCheckpoint on a new solver for the same puzzle.
+            Only moves are saved for each frame on the stack, along with
+            the memo and learned nogoods, as gzipped JSON.
+        """
+        stack = []
+        for frame in self._stack:
+            stack.append({
+                'move': frame.moveApplied,
+                'pending': frame.pendingMoves(),
+                'taken': frame.branching[0],
+                'aborted': frame.aborted,
+                'solutionBelow': frame.solutionBelow})
+        state = {
+            'version': 1,
+            'puzzle': self._puzzle.fingerprint(),
+            'visited': self._totalframes,
+            'backjumps': self._backjumps,
+            'backtracks': self._backtracks,
+            'maxDepth': self._maxdepth,
+            'branching': sorted(self._branching.items()),
+            'stack': stack,
+            'memo': self._memo.dump(),
+            'nogoods': self._nogoods.dump()}
+        import gzip
+        import json
+        temppath = filepath + '.tmp'
+        with gzip.open(temppath, 'wt') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(temppath, filepath)
+
+    def loadCheckpoint(self, filepath):
+        """Continue the search saved by saveCheckpoint."""
+        import gzip
+        import json
+        with gzip.open(filepath, 'rt') as f:
+            state = json.load(f)
+        if state.get('version') != 1:
+            raise ValueError("unknown checkpoint version")
+        if state['puzzle'] != self._puzzle.fingerprint():
+            raise ValueError("checkpoint is for a different puzzle")
+        stack = []
+        for level in state['stack']:
+            if stack:
+                stack.append(stack[-1].moveHead(*level['move']))
+            else:
+                stack.append(self._Frame.initial(
+                    self._puzzle, self._assumeUnique, self._ordering))
+        for frame, level in zip(stack, state['stack']):
+            if level['pending'] is not None:
+                frame.restoreNextFrames(level['pending'], level['taken'])
+            if level['aborted']:
+                frame.abort()
+            if level['solutionBelow']:
+                frame.markSolution()
+        self._stack = stack
+        if stack:
+            self._paths = self._Paths(stack[0].headPairs)
+            for frame in stack[1:]:
+                self._paths.push(frame.moveApplied)
+        self._totalframes = state['visited']
+        self._backjumps = state['backjumps']
+        self._backtracks = state.get('backtracks', 0)
+        self._maxdepth = state.get('maxDepth', len(stack))
+        self._branching = dict(state.get('branching', ()))
+        self._memo.load(state['memo'])
+        self._nogoods.load(state['nogoods'])
 
     def _stateFingerprint(self):
         digits = '2345679abcdefghknpqrtuwxyzABFGHLNQR'
@@ -523,14 +1429,41 @@ class FlowSolver(object):
             hash //= len(digits)
         return result
 
+    def statistics(self):
+        """
+            Return a dict describing the search so far:
+            visited, backtracks, backjumps: counts of frames
+            maxDepth: greatest number of frames on the stack
+            memoHitRate: fraction of memo lookups which pruned a frame
+            forcedRatio: fraction of expanded frames with one child
+            branching: {number of children: frames expanded with that many}
+        """
+        expanded = sum(self._branching.values())
+        return {
+            'visited': self._totalframes,
+            'backtracks': self._backtracks,
+            'backjumps': self._backjumps,
+            'maxDepth': self._maxdepth,
+            'memoHitRate': self._memo.hitRate,
+            'forcedRatio': (self._branching.get(1, 0) / float(expanded)
+                            if expanded else 0.0),
+            'branching': dict(self._branching)}
+
     def printStats(self):
         print("{0} visited".format(self.statesVisited))
         print("memo: " + self._memo.stats())
+        print("nogoods: " + self._nogoods.stats())
+        print("{0} frames skipped by backjumping".format(self._backjumps))
+        stats = self.statistics()
+        print("{0} backtracks, depth {1}, {2:.2%} forced".format(
+            stats['backtracks'], stats['maxDepth'], stats['forcedRatio']))
         if self.solved:
             print("solution " + self._stateFingerprint())
 
     def getFlows(self):
-        return self._Frame.recoverPaths(self._stack)
+        if not self._stack:
+            return []
+        return self._paths.paths()
 
     def _immutableFlows(self):
         flows = []
@@ -541,3 +1474,117 @@ class FlowSolver(object):
         return frozenset(flows)
 
     __getFlows = getFlows
+
+
+class BestFirstFlowSolver(object):
+    """
+        Expands the most promising frame seen so far rather than the most
+        recent, so a bad early choice doesn't trap the search. Frames are
+        scored by a function returning a sortable value, lowest first.
+        When more than capacity frames are waiting, the worst are dropped
+        and the search becomes a beam search, which may miss solutions.
+    """
+
+    @staticmethod
+    def defaultScore(frame):
+        # favor frames closer to done, then those less broken up
+        return frame.openSize, len(frame.reducedGraph.components)
+
+    def __init__(self, puzzle, score=None, capacity=200000, ordering=None):
+        if isinstance(ordering, str):
+            ordering = moveOrderings[ordering]()
+        self._score = score or self.defaultScore
+        self._capacity = capacity
+        self._memo = FlowSolver._Memo()
+        self._order = count()
+        # self._queue  heap of (score, order, frame, trail)
+        #              trail is (move, parent trail) back to None
+        self._queue = []
+        self._solution = None
+        self._truncated = 0
+        self._totalframes = 1
+        initial = FlowSolver._Frame.initial(puzzle, ordering=ordering)
+        self._headpairs = list(initial.headPairs)
+        if not initial.simpleUnsolvable() and \
+           not initial.colorUnsolvable():
+            self._push(initial, None)
+
+    @property
+    def done(self):
+        return self._solution is not None or not self._queue
+
+    @property
+    def solved(self):
+        return self._solution is not None
+
+    @property
+    def truncated(self):
+        """True if frames were dropped, so failing proves nothing."""
+        return self._truncated > 0
+
+    @property
+    def statesVisited(self):
+        return self._totalframes
+
+    def step(self):
+        """Expand the best waiting frame. Return True if solved."""
+        if self.done:
+            return self.solved
+        _, _, frame, trail = heapq.heappop(self._queue)
+        while frame.hasNext:
+            child = frame.takeNextFrame()
+            self._totalframes += 1
+            childtrail = (child.moveApplied, trail)
+            if child.isSolved():
+                self._solution = childtrail
+                return True
+            # the memo holds states already queued, not only dead ones
+            if child.simpleUnsolvable() or child.colorUnsolvable() or \
+               self._memo.find(child) or child.biconnectedUnsolvable():
+                continue
+            self._push(child, childtrail)
+        return False
+
+    def run(self, limit=None):
+        """limit is number of frames expanded"""
+        while not self.done:
+            if self.step():
+                return True
+            if limit is not None:
+                limit -= 1
+                if limit <= 0:
+                    return False
+        return True
+
+    def printStats(self):
+        print("{0} visited".format(self.statesVisited))
+        print("{0} waiting, {1} dropped".format(
+            len(self._queue), self._truncated))
+        print("memo: " + self._memo.stats())
+
+    def getFlows(self):
+        if self._solution is not None:
+            trail = self._solution
+        elif self._queue:
+            trail = self._queue[0][3]
+        else:
+            return []
+        moves = []
+        while trail is not None:
+            move, trail = trail
+            moves.append(move)
+        moves.reverse()
+        return FlowSolver._Frame.tracePaths(self._headpairs, moves)
+
+    def _push(self, frame, trail):
+        # failureRoot isn't used here, and the roots would keep queued
+        # frames' expanded ancestors alive
+        frame.forgetFocusRoot()
+        self._memo.insert(frame)
+        heapq.heappush(self._queue,
+                       (self._score(frame), -next(self._order), frame, trail))
+        if len(self._queue) > self._capacity:
+            keep = self._capacity * 3 // 4
+            self._truncated += len(self._queue) - keep
+            self._queue = heapq.nsmallest(keep, self._queue)
+            heapq.heapify(self._queue)
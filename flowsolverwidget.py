@@ -2,14 +2,19 @@
 
 from os import path
 from datetime import datetime, timedelta
-from PyQt5.QtCore import QCoreApplication, QSize, pyqtSignal
+from PyQt5.QtCore import QSize, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QImageWriter
 from PyQt5.QtWidgets import QWidget
 from flowpainter import SpacedGrid, FlowBoardPainter
-from flowboard import FlowBoardSolver
+from flowboard import solveBoard
+from flowworker import FlowWorker
 
 
 class FlowSolverWidget(QWidget):
+    """
+        Solves a board in a worker process and paints the snapshots
+        it sends back, so the GUI thread only ever draws.
+    """
 
     finished = pyqtSignal(bool)
 
@@ -19,10 +24,12 @@ class FlowSolverWidget(QWidget):
         self.setFixedSize(self.sizeHint())
         self._board = None
         self._grid = None
-        self._solver = None
+        self._snapshot = None
         self._startTime = None
         self._endTime = None
-        self._run = False
+        self._worker = FlowWorker(30)
+        self._worker.received.connect(self._snapshotReceived)
+        self._worker.lost.connect(self.stop)
 
     @property
     def timeElapsed(self):
@@ -30,60 +37,85 @@ class FlowSolverWidget(QWidget):
             return timedelta(0)
         return (self._endTime or datetime.now()) - self._startTime
 
+    @property
+    def progress(self):
+        if self._snapshot is None:
+            return 0.0
+        return self._snapshot.progress
+
+    @property
+    def solved(self):
+        return self._snapshot is not None and self._snapshot.solved
+
     def setBoard(self, board):
+        self._worker.stop()
         self._startTime = None
         self._endTime = None
+        self._snapshot = None
         if board is None:
             self._board = None
             self._grid = None
-            self._solver = None
         else:
             self._board = board
             self._grid = SpacedGrid(
                 self._board.size, self._board.size, self.rect().size(), 2)
-            self._solver = FlowBoardSolver(self._board)
 
     def run(self, skipSolution=False):
-        if self._solver.done:
-            if skipSolution and self._solver.solved:
-                self._solver.skipSolution()
+        if self._snapshot is not None and self._snapshot.done:
+            if (skipSolution and self._snapshot.solved and
+                    self._worker.running):
+                self._worker.send('next')
             else:
-                self.finished.emit(self._solver.solved)
+                self.finished.emit(self._snapshot.solved)
                 return
-        self._run = True
+        elif not self._worker.running:
+            self._worker.start(solveBoard, self._board)
         self._startTime = datetime.now()
         self._endTime = None
-        try:
-            while self._run and not self._solver.run(20):
-                while QCoreApplication.hasPendingEvents():
-                    QCoreApplication.processEvents()
-        finally:
+        self._worker.resume()
+
+    def stop(self):
+        running = self._worker.polling
+        self._worker.stop()
+        if running:
             self._endTime = datetime.now()
-            self.finished.emit(self._solver.solved)
+            self.finished.emit(self.solved)
             self.repaint()
 
-    def stop(self):
-        self._run = False
+    @pyqtSlot(object)
+    def _snapshotReceived(self, snapshot):
+        self._snapshot = snapshot
+        self.update()
+        if snapshot.done:
+            self._worker.pause()
+            self._endTime = datetime.now()
+            if not snapshot.solved:
+                self._worker.stop()
+            self.finished.emit(snapshot.solved)
+
+    def closeEvent(self, event):
+        self._worker.stop()
+        super(FlowSolverWidget, self).closeEvent(event)
 
     def paintEvent(self, event):
         super(FlowSolverWidget, self).paintEvent(event)
         ptr = FlowBoardPainter(self)
         ptr.fillBackground()
         if self._board:
-            if self._solver and self._solver.solved:
-                ptr.drawFlowHighlights(self._grid, self._solver)
+            if self.solved:
+                ptr.drawFlowHighlights(self._grid, self._snapshot)
             ptr.drawGrid(self._grid)
             ptr.drawBoardFeatures(self._grid, self._board)
-            if self._solver:
-                ptr.drawFlows(self._grid, self._solver)
+            if self._snapshot:
+                ptr.drawFlows(self._grid, self._snapshot)
         ptr.end()
 
     def sizeHint(self):
         return QSize(self._size, self._size)
 
     def saveImage(self, dirpath):
-        img = FlowBoardPainter.renderImage(self._board, self._solver)
-        filename = hex(abs(self._solver.stateHash()))[2:] + '.png'
+        img = FlowBoardPainter.renderImage(self._board, self._snapshot)
+        filename = hex(abs(self._snapshot.stateHash()))[2:] + '.png'
         writer = QImageWriter(path.join(dirpath, filename))
         writer.setFormat('png')
         if not writer.write(img):
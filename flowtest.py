@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import random
+from flowboard import FlowBoard
+from flowsolver import FlowSolver
+from flowgenerator import generateBoard
+
+
+def _randomBoard(rng):
+    size = rng.choice([4, 5])
+    pairs = rng.choice([2, 3])
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    board = FlowBoard(size)
+    for key, cell in enumerate(rng.sample(cells, 2 * pairs)):
+        board.setEndpoint(cell, key // 2 + 1)
+    return board
+
+
+def _bruteForceCount(puzzle):
+    # every way of joining each pair by a simple path, the paths
+    # disjoint and covering the graph, counted without pruning
+    graph = puzzle.graph
+    pairs = list(puzzle.endpointPairs)
+    ends = set(v for pair in pairs for v in pair)
+    vertices = set(graph.vertices)
+
+    def count(i, used):
+        if i == len(pairs):
+            return int(used == vertices)
+        start, end = pairs[i]
+        total = 0
+        stack = [(start, used | {start})]
+        while stack:
+            v, pathused = stack.pop()
+            for u in graph.adjacencies(v):
+                if u == end:
+                    total += count(i + 1, pathused | {end})
+                elif u not in pathused and u not in ends:
+                    stack.append((u, pathused | {u}))
+        return total
+
+    return count(0, frozenset())
+
+
+def _assertSolution(puzzle, flows):
+    graph = puzzle.graph
+    covered = set()
+    for flow, pair in zip(flows, puzzle.endpointPairs):
+        assert {flow[0], flow[-1]} == set(pair)
+        for v1, v2 in zip(flow, flow[1:]):
+            assert graph.adjacent(v1, v2)
+        assert not covered.intersection(flow)
+        covered.update(flow)
+    assert covered == set(graph.vertices)
+
+
+def _testSolutions():
+    rng = random.Random('consistent seed')
+    several = 0
+    for _ in range(200):
+        puzzle = _randomBoard(rng).getPuzzle()[0]
+        expected = _bruteForceCount(puzzle)
+        solver = FlowSolver(puzzle)
+        found = set()
+        for n, (flows, stats) in enumerate(solver.solutions(), 1):
+            _assertSolution(puzzle, flows)
+            assert stats['solution'] == n
+            found.add(tuple(tuple(flow) for flow in flows))
+            assert len(found) == n
+        assert len(found) == expected
+        assert solver.done and not solver.solved
+        if expected > 1:
+            several += 1
+            solver = FlowSolver(puzzle)
+            first = list(solver.solutions(count=1))
+            assert len(first) == 1
+            assert solver.solved
+            assert list(solver.getFlows()) == first[0][0]
+            # resuming yields the solution stopped at, then the others
+            rest = list(solver.solutions())
+            assert len(rest) == expected
+            assert rest[0][0] == first[0][0]
+    assert several > 0
+
+
+def _testGenerateBoard():
+    # blockages at this density cut cells off on some of these seeds;
+    # the time allowed is far more than these boards need, and the
+    # check here counts frames so it doesn't depend on the machine
+    for seed in range(12):
+        board = generateBoard(5, 4, density=0.25, seed=seed, seconds=60.0)
+        assert board is not None and board.isValid()
+        assert len(list(board.blockages)) == 6
+        solver = FlowSolver(board.getPuzzle()[0])
+        assert len(list(solver.solutions(2, frames=1000))) == 1
+        assert solver.done and not solver.solved
+
+
+if __name__ == '__main__':
+    _testSolutions()
+    _testGenerateBoard()
+    print("Tests passed.")
+    exit(0)
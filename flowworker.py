@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+from multiprocessing import get_context
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+
+class FlowWorker(QObject):
+    """
+        Runs target(*args, conn) in a worker process, polling its end of
+        the pipe from the GUI thread and emitting what the worker sends.
+    """
+
+    # the latest message received since the last poll
+    received = pyqtSignal(object)
+    # the worker closed its end of the pipe, most likely by dying
+    lost = pyqtSignal()
+
+    def __init__(self, interval):
+        super(FlowWorker, self).__init__()
+        # self._interval  milliseconds between polls
+        self._interval = interval
+        self._process = None
+        self._conn = None
+        self._pollTimer = QTimer()
+        self._pollTimer.timeout.connect(self._poll)
+
+    @property
+    def running(self):
+        return self._process is not None
+
+    @property
+    def polling(self):
+        return self._pollTimer.isActive()
+
+    def start(self, target, *args):
+        self.stop()
+        # spawn, as forking a process running Qt is unsafe
+        context = get_context('spawn')
+        self._conn, workerconn = context.Pipe()
+        self._process = context.Process(
+            target=target, args=args + (workerconn,), daemon=True)
+        self._process.start()
+        workerconn.close()
+        self.resume()
+
+    def send(self, message):
+        self._conn.send(message)
+
+    def pause(self):
+        """Stop polling, leaving the worker running."""
+        self._pollTimer.stop()
+
+    def resume(self):
+        self._pollTimer.start(self._interval)
+
+    def stop(self):
+        self._pollTimer.stop()
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._conn.close()
+            self._process = None
+            self._conn = None
+
+    @pyqtSlot()
+    def _poll(self):
+        # drain the pipe before emitting, as handlers may stop the worker
+        messages = []
+        try:
+            while self._conn.poll():
+                messages[:] = [self._conn.recv()]
+        except EOFError:
+            # deliver what came before the end, the next poll reports it
+            if not messages:
+                self.lost.emit()
+                return
+        if messages:
+            self.received.emit(messages[0])
@@ -4,8 +4,11 @@ import random
 from copy import deepcopy
 from itertools import combinations
 from functools import reduce
-from graph import SimpleGraph, QueryableSimpleGraph, OnlineReducedGraph
-from graph.tree import Tree
+from graph import SimpleGraph, QueryableSimpleGraph, OnlineReducedGraph, \
+    GraphOntoRectangularGrid
+from graph.tree import Tree, Forest
+# noinspection PyProtectedMember
+from graph.simplegraph import _augmentingPathMatching
 
 
 def _testGraph():
@@ -165,6 +168,26 @@ def _testReducedGraph():
     assert g.disjoint is True
 
 
+def _testReducedGraphBalance():
+    og = _build4by4()
+    left, right = og.bipartition()
+    colors = dict.fromkeys(left, 1)
+    colors.update(dict.fromkeys(right, -1))
+    g = OnlineReducedGraph(og, colors=colors)
+    c = list(g.components.keys())[0]
+    assert g.componentBalance(c) == 0
+    g.maskVertex(0)
+    assert g.componentBalance(c) == -colors[0]
+    for v in [5, 10, 15, 7, 13]:
+        g = g.copy()
+        g.maskVertex(v)
+        # noinspection PyProtectedMember
+        g._assertValidState()
+    assert len(g.components) == 4
+    for k, part in g.components.items():
+        assert g.componentBalance(k) == sum(colors[v] for v in part)
+
+
 def _equalSetSets(sets_a, sets_b):
     sets_a = set(frozenset(s) for s in sets_a)
     sets_b = set(frozenset(s) for s in sets_b)
@@ -231,6 +254,8 @@ def _testGraphBiconnected():
         vertlist = list(verts)
         random.shuffle(vertlist)
         rgstack = [OnlineReducedGraph(QueryableSimpleGraph(deepcopy(es)))]
+        # checked against one built from scratch by _assertValidState
+        rgstack[0].blockCutForest()
         for v in vertlist:
             rgstack.append(rgstack[-1].copy())
             rgstack[-1].maskVertex(v)
@@ -289,6 +314,52 @@ def _testGraphBiconnected():
             g.removeVertex(v)
 
 
+def _testBlockCutForest():
+    random.seed('consistent seed')
+    grid = GraphOntoRectangularGrid(6)
+    reused = 0
+    for _ in range(5):
+        rg = OnlineReducedGraph(grid.graph)
+        rg.blockCutForest()
+        verts = list(rg.vertices)
+        random.shuffle(verts)
+        for v in verts[:-1]:
+            parentforest = rg.blockCutForest()
+            rg = rg.copy()
+            rg.maskVertex(v)
+            # carried over from the parent state, not rebuilt
+            # noinspection PyProtectedMember
+            assert rg._blockCutForest is not None
+            # noinspection PyProtectedMember
+            rg._assertValidState()
+            if rg.blockCutForest() is parentforest:
+                assert not rg.separatorsChanged
+                reused += 1
+            bf, bfmap, bfseps = rg.blockForest()
+            bcf = rg.blockCutForest()
+            nodemap = {}  # block forest vertex : block-cut forest node
+            for u in rg.vertices:
+                n, = rg.blockCutNodes([u])
+                assert nodemap.setdefault(bfmap[u], n) == n
+                assert (bfmap[u] in bfseps) == bool(bcf.articulations >> n & 1)
+            assert len(set(nodemap.values())) == len(nodemap)
+            blocks = 0
+            for n in set(bfmap.values()) - bfseps:
+                blocks |= 1 << nodemap[n]
+            assert blocks == bcf.blocks
+            inverse = dict((n, bfn) for bfn, n in nodemap.items())
+            for a, b in combinations(inverse, 2):
+                path = bf.shortestPath(inverse[a], inverse[b])
+                mask = bcf.pathMask(a, b)
+                assert mask == bcf.pathMask(b, a)
+                assert len([n for n in path if n in bfseps]) == \
+                    bin(mask & bcf.articulations).count('1')
+                for bfn in path:
+                    if bfn in nodemap:
+                        assert mask >> nodemap[bfn] & 1
+    assert reused > 0
+
+
 def _build4by4():
     # makes a grid structure like:
     # 0 - 1 - 2 - 3
@@ -457,6 +528,37 @@ def _testTree():
     t.add(9, 7)
     assert t.findPath(6, 3) == [6, 2, 1, 3]
     assert t.findPath(6, 9) == [6, 2, 7, 9]
+    assert t.lowestCommonAncestor(6, 9) == 2
+    assert t.lowestCommonAncestor(9, 5) == 1
+    assert t.lowestCommonAncestor(7, 9) == 7
+    assert t.ancestor(9, 0) == 9
+    assert t.ancestor(9, 3) == 1
+
+    random.seed('consistent seed')
+    t = Tree(0)
+    for v in range(1, 500):
+        t.add(v, random.randrange(max(0, v - 5), v))
+    for _ in range(200):
+        v, u = random.randrange(500), random.randrange(500)
+        v_up, u_up = t.pathToRoot(v), t.pathToRoot(u)
+        assert v_up[-1] == u_up[-1] == t.root
+        assert len(v_up) == t.depthOf(v) + 1
+        while len(v_up) > 1 and len(u_up) > 1 and v_up[-2] == u_up[-2]:
+            v_up.pop()
+            u_up.pop()
+        assert t.lowestCommonAncestor(v, u) == v_up[-1]
+        assert t.findPath(v, u) == v_up + list(reversed(u_up[:-1]))
+
+    f = Forest()
+    f.addTree(1)
+    f.addTree(2)
+    f.add(3, 1)
+    f.add(4, 1)
+    f.add(5, 2)
+    assert f.lowestCommonAncestor(3, 4) == 1
+    assert f.lowestCommonAncestor(3, 5) is None
+    assert f.findPath(3, 4) == [3, 1, 4]
+    assert f.findPath(4, 5) is None
 
 
 def _testMatching():
@@ -513,11 +615,41 @@ def _testMatching():
     assert g.maximumMatching().isPerfectMatching()
 
 
+def _testBipartiteMatching():
+    g = _build4by4()
+    left, right = g.bipartition()
+    assert left | right == set(g.vertices)
+    assert len(left) == len(right) == 8
+    for v1, v2 in g.edges:
+        assert (v1 in left) != (v2 in left)
+    assert g.bipartition([0, 1, 2]) is not None
+    g.addEdge(0, 5)
+    assert g.bipartition() is None
+    assert g.bipartition([0, 1, 4]) is not None
+    assert g.bipartition([0, 1, 5]) is None
+
+    random.seed('consistent seed')
+    for _ in range(30):
+        g = SimpleGraph()
+        left = g.pushVertices(random.randrange(1, 20))
+        right = g.pushVertices(random.randrange(1, 20))
+        for v1 in left:
+            for v2 in random.sample(right, random.randrange(len(right))):
+                g.addEdge(v1, v2)
+        m = g.maximumMatching()
+        assert m.isMatching()
+        assert m.edges <= g.edges
+        assert m.edgeCount() == _augmentingPathMatching(g).edgeCount()
+
+
 if __name__ == '__main__':
     _testMatching()
+    _testBipartiteMatching()
     _testGraph()
     _testReducedGraph()
+    _testReducedGraphBalance()
     _testGraphBiconnected()
+    _testBlockCutForest()
     _testSortClosest()
     _testShortestPath()
     _testEccentricity()
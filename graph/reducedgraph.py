@@ -7,9 +7,16 @@ from graph import SimpleGraph
 
 
 class OnlineReducedGraph(object):
-    def __init__(self, graph, state=None):
+    __slots__ = ('_graph', '_keys', '_vertices', '_components',
+                 '_biconComponents', '_separators', '_biconComponentMap',
+                 '_separatorMap', '_blockCutForest', '_colors', '_balances',
+                 '_c_k_deleted', '_c_k_reduced', '_c_kset_new',
+                 '_separatorsChanged', '_ownBiconMap', '_ownSeparatorMap')
+
+    def __init__(self, graph, state=None, colors=None):
         self._graph = graph
         if state is None:
+            self._colors = colors
             self._initializeState()
         else:
             (self._keys,
@@ -18,11 +25,15 @@ class OnlineReducedGraph(object):
              self._biconComponents,
              self._separators,
              self._biconComponentMap,
-             self._separatorMap) = state
+             self._separatorMap,
+             self._blockCutForest,
+             self._colors,
+             self._balances) = state
         self._c_k_deleted = None
         self._c_k_reduced = None
         self._c_kset_new = None
         self._separatorsChanged = False
+        self._ownBiconMap = self._ownSeparatorMap = False
 
     def copy(self):
         return OnlineReducedGraph(self._graph, (
@@ -32,7 +43,10 @@ class OnlineReducedGraph(object):
             self._biconComponents,
             self._separators,
             self._biconComponentMap,
-            self._separatorMap))
+            self._separatorMap,
+            self._blockCutForest,
+            self._colors,
+            self._balances))
 
     @property
     def componentDeleted(self):
@@ -73,6 +87,10 @@ class OnlineReducedGraph(object):
     def edgeCount(self):
         return self._graph.edgeCount(self._vertices)
 
+    def componentBalance(self, k):
+        """Sum of colors of vertices in component k"""
+        return self._balances[k]
+
     def blockForest(self):
         bf = SimpleGraph()
         vertexmap = {}  # vertex: vertex in block forest
@@ -94,6 +112,34 @@ class OnlineReducedGraph(object):
                     bf.addEdge(bcv, vertexmap[sv])
         return bf, vertexmap, articulations
 
+    def blockCutForest(self):
+        """
+            Return BlockCutForest for current state.
+            The forest is built on first use, then shared by copies and
+            kept up to date by maskVertex.
+        """
+        if self._blockCutForest is None:
+            self._blockCutForest = BlockCutForest(
+                self._biconComponents, self._separators, self._separatorMap)
+        return self._blockCutForest
+
+    def blockCutNodes(self, vertices):
+        """Return set of blockCutForest() nodes containing vertices."""
+        forest = self.blockCutForest()
+        nodes = set()
+        for v in vertices:
+            if v in self._separators:
+                nodes.add(forest.separatorNode(v))
+            else:
+                bc_k, = self._biconComponentMap[v]
+                nodes.add(forest.blockNode(bc_k))
+        return nodes
+
+    def blockComponent(self, n):
+        """Return the component containing block node n of blockCutForest()."""
+        bc = self._biconComponents[self.blockCutForest().blockKey(n)]
+        return self.connectedComponent(next(iter(bc)))
+
     def maskVertex(self, v):
         self._vertices = self._vertices.copy()
         self._vertices.remove(v)
@@ -105,9 +151,13 @@ class OnlineReducedGraph(object):
         self._c_k_reduced = None
         self._c_kset_new = None
         c = self._components[c_k]
+        if self._colors is not None:
+            self._balances = self._balances.copy()
         if len(c) == 1:
             self._c_k_deleted = c_k
             del self._components[c_k]
+            if self._colors is not None:
+                del self._balances[c_k]
         else:
             c = c.copy()
             c.remove(v)
@@ -120,16 +170,28 @@ class OnlineReducedGraph(object):
                     self._components[c_k_new] = c_new
                     self._c_kset_new.add(c_k_new)
                 # assert len(self._c_kset_new) > 1
+                if self._colors is not None:
+                    del self._balances[c_k]
+                    for c_k_new in self._c_kset_new:
+                        self._balances[c_k_new] = sum(
+                            map(self._colors.get, self._components[c_k_new]))
             else:
                 self._c_k_reduced = c_k
                 self._components[c_k] = c
+                if self._colors is not None:
+                    self._balances[c_k] -= self._colors[v]
         # self._components valid
 
+        # Masked vertices are left in _biconComponentMap. It and
+        # _separatorMap are shared with the parent state until written.
         self._biconComponents = self._biconComponents.copy()
-        self._separatorMap = self._separatorMap.copy()
-        self._biconComponentMap = self._biconComponentMap.copy()
-        bc_kset = self._biconComponentMap.pop(v).copy()
+        self._ownBiconMap = self._ownSeparatorMap = False
+        bc_kset = self._biconComponentMap[v].copy()
         bc_kset_reduced = None
+        # keys of blocks removed, created, and changed in size or
+        # separators, and separators lost and gained, for the forest
+        dropped, added, resized = [], [], []
+        lostseps = newseps = ()
         if self._c_k_deleted:
             if self._c_kset_new:
                 # assert len(bc_kset) > 1
@@ -141,7 +203,8 @@ class OnlineReducedGraph(object):
                 # assert len(self._separatorMap[bc_k]) == 0
                 bc_k = bc_kset.pop()
                 del self._biconComponents[bc_k]
-                del self._separatorMap[bc_k]
+                del self._writableSeparatorMap()[bc_k]
+                dropped.append(bc_k)
         else:
             # assert self._c_k_reduced
             # assert v not in self._separators
@@ -164,42 +227,72 @@ class OnlineReducedGraph(object):
                         # another biconnected component
                         bc_kset_other = bc_kset_other.copy()
                         bc_kset_other.remove(bc_k)
-                        self._biconComponentMap[other] = bc_kset_other
+                        self._writableBiconComponentMap()[other] = \
+                            bc_kset_other
                         del self._biconComponents[bc_k]
-                        del self._separatorMap[bc_k]
+                        del self._writableSeparatorMap()[bc_k]
+                        dropped.append(bc_k)
                         if len(bc_kset_other) == 1:
                             separators.remove(other)
                             bc_k_other = next(iter(bc_kset_other))
                             m = self._separatorMap[bc_k_other].copy()
                             m.remove(other)
                             self._separatorMap[bc_k_other] = m
+                            resized.append(bc_k_other)
                         continue
 
                 bcs, seps = self._graph.biconnectedComponents(bc_reduced)
                 if seps:
+                    bcmap = self._writableBiconComponentMap()
+                    sepmap = self._writableSeparatorMap()
                     del self._biconComponents[bc_k]
-                    for bcv in bc_reduced:
-                        ks = self._biconComponentMap[bcv].copy()
-                        ks.remove(bc_k)
-                        self._biconComponentMap[bcv] = ks
-                    oldseps = self._separatorMap.pop(bc_k)
-                    for newbc_k, newbc in zip(self._keys, bcs):
+                    allseps = sepmap.pop(bc_k) | seps
+                    newbcs = list(zip(self._keys, bcs))
+                    for newbc_k, newbc in newbcs:
                         self._biconComponents[newbc_k] = newbc
-                        self._separatorMap[newbc_k] = newbc & (oldseps | seps)
-                        for bcv in newbc:
-                            self._biconComponentMap[bcv].add(newbc_k)
+                        sepmap[newbc_k] = newbc & allseps
+                        # vertices in a single block share its key set
+                        ks = {newbc_k}
+                        for bcv in newbc - allseps:
+                            bcmap[bcv] = ks
+                    for bcv in bc_reduced & allseps:
+                        ks = bcmap[bcv] - {bc_k}
+                        ks.update(newbc_k for newbc_k, newbc in newbcs
+                                  if bcv in newbc)
+                        bcmap[bcv] = ks
                     separators |= seps
+                    dropped.append(bc_k)
+                    added.extend(newbc_k for newbc_k, _ in newbcs)
                 else:
                     self._biconComponents[bc_k] = bc_reduced
                     seps = self._separatorMap[bc_k]
                     if v in seps:
                         seps = seps.copy()
                         seps.remove(v)
-                        self._separatorMap[bc_k] = seps
+                        self._writableSeparatorMap()[bc_k] = seps
+                    resized.append(bc_k)
 
             if separators != self._separators:
+                lostseps = self._separators - separators
+                newseps = separators - self._separators
                 self._separators = separators
                 self._separatorsChanged = True
+        if self._blockCutForest is not None:
+            self._blockCutForest = self._blockCutForest.updated(
+                self._biconComponents, self._separatorMap, lostseps,
+                newseps, dropped, added, resized)
+
+    def _writableBiconComponentMap(self):
+        if not self._ownBiconMap:
+            self._biconComponentMap = self._biconComponentMap.copy()
+            self._ownBiconMap = True
+        return self._biconComponentMap
+
+    def _writableSeparatorMap(self):
+        if not self._ownSeparatorMap:
+            self._separatorMap = self._separatorMap.copy()
+            self._ownSeparatorMap = True
+        return self._separatorMap
 
     def adjacencies(self, v):
         """Get neighbors of v"""
@@ -262,14 +355,22 @@ class OnlineReducedGraph(object):
         # self._components         key: set of vertices
         # self._biconComponents    key: set of vertices
         # self._separators         set of vertices
-        # self._biconComponentMap  v: set of bicon component keys
+        # self._biconComponentMap  v: set of bicon component keys,
+        #                          may include masked vertices
         # self._separatorMap       bicon component key: set of separators
+        # self._blockCutForest     BlockCutForest or None if not built
+        # self._colors             v: +1 or -1, or None
+        # self._balances           component key: sum of colors, or None
 
         self._keys = count(1)
 
         self._vertices = set(self._graph.vertices)
         self._components = \
             dict(zip(self._keys, self._graph.disjointPartitions()))
+        self._balances = None
+        if self._colors is not None:
+            self._balances = dict((k, sum(map(self._colors.get, c)))
+                                  for k, c in self._components.items())
 
         bcs, seps = self._graph.biconnectedComponents()
         self._biconComponents = dict(zip(self._keys, bcs))
@@ -282,16 +383,22 @@ class OnlineReducedGraph(object):
                 self._biconComponentMap[v].add(k)
                 if v in self._separators:
                     self._separatorMap[k].add(v)
+        self._blockCutForest = None
 
     def _assertValidState(self):
-        assert self._vertices == set(self._biconComponentMap)
+        assert self._vertices <= set(self._biconComponentMap)
         componentSum = set()
         for k, c in self._components.items():
             assert c
             assert not c & componentSum
             componentSum |= c
         assert self._vertices == componentSum
-        for v, kset in self._biconComponentMap.items():
+        if self._colors is not None:
+            assert set(self._balances) == set(self._components)
+            for k, c in self._components.items():
+                assert self._balances[k] == sum(map(self._colors.get, c))
+        for v in self._vertices:
+            kset = self._biconComponentMap[v]
             assert kset
             assert (len(kset) > 1) == (v in self._separators)
             for k in kset:
@@ -310,5 +417,233 @@ class OnlineReducedGraph(object):
             assert bc
             bcs, seps = self._graph.biconnectedComponents(bc)
             assert len(bcs) == 1 and not seps
-            for v, kset in self._biconComponentMap.items():
-                assert (k in kset) == (v in bc)
+            for v in self._vertices:
+                assert (k in self._biconComponentMap[v]) == (v in bc)
+        if self._blockCutForest is not None:
+            # noinspection PyProtectedMember
+            self._blockCutForest._assertValidState(
+                self._biconComponents, self._separators, self._separatorMap)
+
+
+def _bitIndices(bitset):
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+class BlockCutForest(object):
+    """
+        Forest of separators and biconnected components (blocks), each
+        block a node adjacent to the nodes of its separators.
+        Sets of nodes are given as bitsets, node n is bit (1 << n).
+        A forest is never changed once built: updated() derives the
+        forest of the next state by replacing only the nodes of the
+        blocks and separators which changed, so states share it.
+    """
+
+    def __init__(self, biconComponents, separators, separatorMap):
+        self._separatorNodes = {}  # separator : node
+        self._blockNodes = {}  # bicon component key : node
+        self._blockKeys = {}  # node : bicon component key
+        self._adjacent = {}  # node : bitset of adjacent nodes
+        self._parent = {}  # node : parent node, or None for a root
+        self._nodes = 0
+        self._articulations = 0
+        self._blocks = 0
+        self._paths = {}  # (node, node) : bitset
+        for sv in separators:
+            self._addSeparator(sv)
+        for bc_k, bc in biconComponents.items():
+            self._addBlock(bc_k, bc, separatorMap[bc_k])
+        self._setParents(self._nodes)
+
+    @property
+    def articulations(self):
+        """Bitset of separator nodes."""
+        return self._articulations
+
+    @property
+    def blocks(self):
+        """Bitset of block nodes which contain non-separator vertices."""
+        return self._blocks
+
+    def separatorNode(self, v):
+        return self._separatorNodes[v]
+
+    def blockNode(self, bc_k):
+        return self._blockNodes[bc_k]
+
+    def blockKey(self, n):
+        """Return the bicon component key of block node n."""
+        return self._blockKeys[n]
+
+    def pathMask(self, n1, n2):
+        """Bitset of nodes on the path from n1 to n2, 0 if none."""
+        key = (n1, n2) if n1 < n2 else (n2, n1)
+        mask = self._paths.get(key)
+        if mask is None:
+            above = 0  # n1 and its ancestors
+            n = n1
+            while n is not None:
+                above |= 1 << n
+                n = self._parent[n]
+            mask = 0
+            n = n2
+            while n is not None and not above >> n & 1:
+                mask |= 1 << n
+                n = self._parent[n]
+            if n is None:
+                mask = 0
+            else:
+                # n is the lowest common ancestor
+                while n1 != n:
+                    mask |= 1 << n1
+                    n1 = self._parent[n1]
+                mask |= 1 << n
+            self._paths[key] = mask
+        return mask
+
+    def updated(self, biconComponents, separatorMap, lostseps, newseps,
+                dropped, added, resized):
+        """
+            Return the forest after masking a vertex changed the blocks:
+            lostseps and newseps are the separators lost and gained, and
+            dropped, added and resized the keys of the blocks removed,
+            created, and changed in size or separators.
+            Returns self if none of that changes the forest.
+        """
+        blocks = self._blocks
+        for bc_k in resized:
+            bit = 1 << self._blockNodes[bc_k]
+            if len(biconComponents[bc_k]) > len(separatorMap[bc_k]):
+                blocks |= bit
+            else:
+                blocks &= ~bit
+        reshaped = lostseps or newseps or dropped or added
+        if not reshaped and blocks == self._blocks:
+            return self
+        forest = self._copy()
+        forest._blocks = blocks
+        if not reshaped:
+            # paths depend only on the shape, so can share a cache
+            forest._paths = self._paths
+            return forest
+        for sv in lostseps:
+            forest._removeNode(forest._separatorNodes.pop(sv))
+        for bc_k in dropped:
+            n = forest._blockNodes.pop(bc_k)
+            del forest._blockKeys[n]
+            forest._removeNode(n)
+        for sv in newseps:
+            forest._addSeparator(sv)
+        # what a block splits into, and the separators around it
+        region = 0
+        for bc_k in added:
+            n = forest._addBlock(bc_k, biconComponents[bc_k],
+                                 separatorMap[bc_k])
+            region |= 1 << n | forest._adjacent[n]
+        forest._setParents(region)
+        return forest
+
+    def _copy(self):
+        forest = BlockCutForest.__new__(BlockCutForest)
+        forest._separatorNodes = self._separatorNodes.copy()
+        forest._blockNodes = self._blockNodes.copy()
+        forest._blockKeys = self._blockKeys.copy()
+        forest._adjacent = self._adjacent.copy()
+        forest._parent = self._parent.copy()
+        forest._nodes = self._nodes
+        forest._articulations = self._articulations
+        forest._blocks = self._blocks
+        forest._paths = {}
+        return forest
+
+    def _newNode(self):
+        # the lowest free node keeps the bitsets short
+        low = ~self._nodes & (self._nodes + 1)
+        self._nodes |= low
+        n = low.bit_length() - 1
+        self._adjacent[n] = 0
+        return n
+
+    def _addSeparator(self, sv):
+        n = self._newNode()
+        self._separatorNodes[sv] = n
+        self._articulations |= 1 << n
+
+    def _addBlock(self, bc_k, bc, seps):
+        n = self._newNode()
+        self._blockNodes[bc_k] = n
+        self._blockKeys[n] = bc_k
+        for sv in seps:
+            sn = self._separatorNodes[sv]
+            self._adjacent[n] |= 1 << sn
+            self._adjacent[sn] |= 1 << n
+        if len(bc) > len(seps):
+            self._blocks |= 1 << n
+        return n
+
+    def _removeNode(self, n):
+        # what hung from n is left as trees of its own
+        bit = 1 << n
+        for an in _bitIndices(self._adjacent.pop(n)):
+            self._adjacent[an] &= ~bit
+            if self._parent[an] == n:
+                self._parent[an] = None
+        del self._parent[n]
+        self._nodes &= ~bit
+        self._articulations &= ~bit
+        self._blocks &= ~bit
+
+    def _setParents(self, region):
+        # Give the nodes of region parents, through region. A node which
+        # has a parent already is where its part of region hangs from the
+        # rest of the forest, so that part is rooted there.
+        starts = [n for n in _bitIndices(region)
+                  if self._parent.get(n) is not None]
+        starts.extend(_bitIndices(region))
+        for root in starts:
+            if not region >> root & 1:
+                continue
+            region &= ~(1 << root)
+            self._parent.setdefault(root, None)
+            front = [root]
+            while front:
+                n = front.pop()
+                below = self._adjacent[n] & region
+                region &= ~below
+                for an in _bitIndices(below):
+                    self._parent[an] = n
+                    front.append(an)
+
+    def _assertValidState(self, biconComponents, separators, separatorMap):
+        built = BlockCutForest(biconComponents, separators, separatorMap)
+        assert set(self._separatorNodes) == set(built._separatorNodes)
+        assert set(self._blockNodes) == set(built._blockNodes)
+        nodemap = {}  # node : node in built
+        for sv, n in self._separatorNodes.items():
+            nodemap[n] = built._separatorNodes[sv]
+        for bc_k, n in self._blockNodes.items():
+            assert self._blockKeys[n] == bc_k
+            nodemap[n] = built._blockNodes[bc_k]
+        assert set(nodemap) == set(_bitIndices(self._nodes))
+        assert set(nodemap) == set(self._adjacent) == set(self._parent)
+
+        def mapped(bitset):
+            return sum(1 << nodemap[n] for n in _bitIndices(bitset))
+
+        assert mapped(self._articulations) == built._articulations
+        assert mapped(self._blocks) == built._blocks
+        for n in nodemap:
+            assert mapped(self._adjacent[n]) == built._adjacent[nodemap[n]]
+            # parents lead through adjacent nodes to a root
+            steps = 0
+            while self._parent[n] is not None:
+                assert self._adjacent[n] >> self._parent[n] & 1
+                n = self._parent[n]
+                steps += 1
+                assert steps < len(nodemap)
+        for n1, n2 in combinations(nodemap, 2):
+            assert mapped(self.pathMask(n1, n2)) == \
+                built.pathMask(nodemap[n1], nodemap[n2])
@@ -391,21 +391,38 @@ class QueryableSimpleGraph(object):
                self.edgeCount() == self.vertexCount // 2 and\
                self.isMatching()
 
+    def bipartition(self, mask=None):
+        """
+            Return tuple(set, set) of vertices such that every edge joins
+            the two sets, or None if the graph is not bipartite.
+            mask: use only these vertices and their incident edges
+        """
+        vertices = self._maskVertices(mask)
+        side = {}  # vertex : 0 or 1
+        for root in vertices:
+            if root in side:
+                continue
+            side[root] = 0
+            stack = [root]
+            while stack:
+                v = stack.pop()
+                for u in self.adjacencies(v, vertices):
+                    if u not in side:
+                        side[u] = 1 - side[v]
+                        stack.append(u)
+                    elif side[u] == side[v]:
+                        return None
+        parts = (set(), set())
+        for v, i in side.items():
+            parts[i].add(v)
+        return parts
+
     def maximumMatching(self):
         """Return a graph which is a maximum matching in this."""
-        matching = SimpleGraph()
-        matching.addVertices(self.vertices)
-        while True:
-            ap = _findAugmentingPath(self, matching)
-            if not ap:
-                break
-            # assert len(ap) % 2 == 0
-            # augment matching with alternating path
-            for v1, v2 in zip(ap[::2], ap[1::2]):
-                matching.removeAnyEdges(v1)
-                matching.removeAnyEdges(v2)
-                matching.addEdge(v1, v2)
-        return matching
+        parts = self.bipartition()
+        if parts is not None:
+            return _hopcroftKarpMatching(self, parts[0])
+        return _augmentingPathMatching(self)
 
     def _maskVertices(self, mask=None):
         """
@@ -498,6 +515,86 @@ class SimpleGraph(QueryableSimpleGraph):
         self._edges[v].clear()
 
 
+def _augmentingPathMatching(G):
+    """Maximum matching of any simple graph G, one path at a time."""
+    matching = SimpleGraph()
+    matching.addVertices(G.vertices)
+    while True:
+        ap = _findAugmentingPath(G, matching)
+        if not ap:
+            break
+        # assert len(ap) % 2 == 0
+        # augment matching with alternating path
+        for v1, v2 in zip(ap[::2], ap[1::2]):
+            matching.removeAnyEdges(v1)
+            matching.removeAnyEdges(v2)
+            matching.addEdge(v1, v2)
+    return matching
+
+
+def _hopcroftKarpMatching(G, left):
+    """
+        Maximum matching of bipartite G.
+        left is one side of a bipartition of G.
+    """
+    mate = dict((v, None) for v in G.vertices)
+    while True:
+        # layer left vertices by alternating distance from free vertices
+        free = [v for v in left if mate[v] is None]
+        layer = dict((v, 0) for v in free)
+        front = free
+        limit = None  # layer from which free right vertices are reached
+        while front and limit is None:
+            nextfront = []
+            for v in front:
+                for w in G.adjacencies(v):
+                    x = mate[w]
+                    if x is None:
+                        limit = layer[v]
+                    elif x not in layer:
+                        layer[x] = layer[v] + 1
+                        nextfront.append(x)
+            front = nextfront
+        if limit is None:
+            break
+
+        # augment along a maximal set of disjoint shortest paths
+        for root in free:
+            stack = [root]
+            its = [iter(G.adjacencies(root))]
+            via = []  # right vertex taken from each left vertex in stack
+            while stack:
+                v = stack[-1]
+                w = next(its[-1], None)
+                if w is None:
+                    layer[v] = None  # no path from here, don't revisit
+                    stack.pop()
+                    its.pop()
+                    if via:
+                        via.pop()
+                    continue
+                x = mate[w]
+                if x is None:
+                    if layer[v] == limit:
+                        via.append(w)
+                        for v_, w_ in zip(stack, via):
+                            mate[v_] = w_
+                            mate[w_] = v_
+                            layer[v_] = None
+                        break
+                elif layer.get(x) == layer[v] + 1:
+                    via.append(w)
+                    stack.append(x)
+                    its.append(iter(G.adjacencies(x)))
+
+    matching = SimpleGraph()
+    matching.addVertices(G.vertices)
+    for v in left:
+        if mate[v] is not None:
+            matching.addEdge(v, mate[v])
+    return matching
+
+
 def _findAugmentingPath(G, M):
     unmarkedVerts = set(G.vertices)
     unmarkedEdges = G.edges - M.edges
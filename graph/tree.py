@@ -5,6 +5,7 @@ class Tree(object):
     def __init__(self, root):
         self._root = root
         self._nodes = {root: (None, 0)}  # vertex : (parent, depth)
+        self._jumps = {root: []}  # vertex : ancestors at distance 2**i
 
     @property
     def root(self):
@@ -16,6 +17,10 @@ class Tree(object):
     def add(self, v, parent):
         assert v not in self._nodes
         self._nodes[v] = (parent, self.depthOf(parent) + 1)
+        jumps = [parent]
+        while len(self._jumps[jumps[-1]]) >= len(jumps):
+            jumps.append(self._jumps[jumps[-1]][len(jumps) - 1])
+        self._jumps[v] = jumps
 
     def depthOf(self, v):
         return self._nodes[v][1]
@@ -23,18 +28,42 @@ class Tree(object):
     def parent(self, v):
         return self._nodes[v][0]
 
-    def findPath(self, v, u):
+    def ancestor(self, v, distance):
+        """Return the ancestor of v which is 'distance' steps toward root."""
+        assert 0 <= distance <= self.depthOf(v)
+        i = 0
+        while distance:
+            if distance & 1:
+                v = self._jumps[v][i]
+            distance >>= 1
+            i += 1
+        return v
+
+    def lowestCommonAncestor(self, v, u):
         assert v in self._nodes
         assert u in self._nodes
-        v_path = [v]  # path from v toward root
-        u_path = [u]  # path from u toward root
-        while v_path[-1] != u_path[-1]:
-            advance_v = self.depthOf(v_path[-1]) > self.depthOf(u_path[-1])
-            advance_u = self.depthOf(u_path[-1]) > self.depthOf(v_path[-1])
-            if advance_v or not advance_u:
-                v_path.append(self._nodes[v_path[-1]][0])
-            if advance_u or not advance_v:
-                u_path.append(self._nodes[u_path[-1]][0])
+        dv, du = self.depthOf(v), self.depthOf(u)
+        if dv > du:
+            v = self.ancestor(v, dv - du)
+        elif du > dv:
+            u = self.ancestor(u, du - dv)
+        if v == u:
+            return v
+        for i in reversed(range(len(self._jumps[v]))):
+            if i < len(self._jumps[v]) and \
+               self._jumps[v][i] != self._jumps[u][i]:
+                v = self._jumps[v][i]
+                u = self._jumps[u][i]
+        return self.parent(v)
+
+    def findPath(self, v, u):
+        w = self.lowestCommonAncestor(v, u)
+        v_path = [v]  # path from v toward w
+        while v_path[-1] != w:
+            v_path.append(self.parent(v_path[-1]))
+        u_path = [u]  # path from u toward w
+        while u_path[-1] != w:
+            u_path.append(self.parent(u_path[-1]))
         v_path.extend(reversed(u_path[:-1]))
         return v_path
 
@@ -68,6 +97,12 @@ class Forest(object):
     def rootFor(self, v):
         return self._trees[v].root
 
+    def lowestCommonAncestor(self, v, u):
+        vtree = self._trees[v]
+        if vtree is not self._trees[u]:
+            return None
+        return vtree.lowestCommonAncestor(v, u)
+
     def findPath(self, v, u):
         vtree = self._trees[v]
         if vtree is not self._trees[u]: